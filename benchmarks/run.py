@@ -0,0 +1,250 @@
+"""
+Offline benchmark of the API with stubbed Groq and weather backends.
+
+Drives `main.app` in-process at several concurrency levels and writes
+throughput and latency percentiles per endpoint to a JSON file.
+
+    python -m benchmarks.run --concurrency 1 8 32 --requests 200 \
+        --llm-latency 1.5 --llm-jitter 0.5 --output bench.json
+
+With --replay, upstream calls are served from a corpus recorded with
+TRAFFIC_MODE=record instead of the synthetic stand-ins.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.stubs import Latency, install
+
+FARM_PARAMETERS = {
+    "crop": "Wheat",
+    "farmLocation": "Rawalpindi",
+    "currentGrowthStage": "Tillering",
+    "soilType": "Clay",
+    "sowingDate": "2025-02-16",
+    "irrigationType": "Drip",
+    "waterAvailabilityStatus": "Limited",
+    "waterSource": "Groundwater",
+    "fertilizersUsed": "NPK",
+}
+FARM_REPORT = (
+    "The crop is in the tillering stage and appears healthy with a uniform green canopy."
+)
+PREVIOUS_TASKS = [
+    {
+        "taskId": "T-2025-04-W16-01",
+        "title": "Irrigation System Maintenance",
+        "priority": "Medium",
+        "dueDate": "2025-04-19",
+        "status": "Not Started",
+    }
+]
+
+SCENARIOS = {
+    "generate-report": (
+        "POST",
+        "/generate-report",
+        {"image_urls": ["https://example.com/field.jpg"], "parameters": FARM_PARAMETERS},
+    ),
+    "create-tasks": (
+        "POST",
+        "/create-tasks",
+        {
+            "parameters": FARM_PARAMETERS,
+            "farm_report": FARM_REPORT,
+            "previous_tasks": PREVIOUS_TASKS,
+        },
+    ),
+    "create-advisory": (
+        "POST",
+        "/create-advisory",
+        {
+            "parameters": FARM_PARAMETERS,
+            "farm_report": FARM_REPORT,
+            "upcoming_tasks": PREVIOUS_TASKS,
+        },
+    ),
+    "weather": ("GET", "/weather?location=Rawalpindi&days=10", None),
+    "pipeline": (
+        "POST",
+        "/pipeline",
+        {"image_urls": ["https://example.com/field.jpg"], "parameters": FARM_PARAMETERS},
+    ),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario, concurrency, total_requests):
+    method, path, body = SCENARIOS[scenario]
+    latencies = []
+    errors = 0
+    remaining = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Print p50/p95 changes against a previous results file.
+    """
+    with open(baseline_path) as f:
+        baseline = {
+            (row["scenario"], row["concurrency"]): row for row in json.load(f)["results"]
+        }
+    for row in results:
+        previous = baseline.get((row["scenario"], row["concurrency"]))
+        if not previous:
+            continue
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            if previous.get(key) and row.get(key) is not None:
+                change = (row[key] - previous[key]) / previous[key] * 100
+                print(
+                    f"{row['scenario']:>16} c={row['concurrency']:<4} {key:<15}"
+                    f"{previous[key]:>10} -> {row[key]:<10} ({change:+.1f}%)"
+                )
+
+
+async def main(args):
+    install(
+        llm_latency=Latency(args.llm_latency, args.llm_jitter, args.distribution),
+        weather_latency=Latency(args.weather_latency, args.weather_jitter, args.distribution),
+        use_caches=args.use_caches,
+        fake_backends=not args.replay,
+        coalesce=not args.no_coalesce,
+    )
+    if args.replay:
+        import traffic_replay
+
+        traffic_replay.configure("replay", args.replay)
+    from main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                row = await run_scenario(client, scenario, concurrency, args.requests)
+                results.append(row)
+                print(
+                    f"{scenario:>16} c={concurrency:<4} {row['throughput_rps']:>8} rps  "
+                    f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms "
+                    f"errors={row['errors']}"
+                )
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "results": results,
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per run")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Mean seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--weather-latency", type=float, default=0.15, help="Mean seconds")
+    parser.add_argument("--weather-jitter", type=float, default=0.05)
+    parser.add_argument(
+        "--distribution",
+        default="lognormal",
+        choices=["fixed", "uniform", "normal", "lognormal"],
+    )
+    parser.add_argument(
+        "--use-caches",
+        action="store_true",
+        help="Keep the forecast and LLM caches enabled",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(
+            "benchmarks", "results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        ),
+    )
+    parser.add_argument(
+        "--no-coalesce",
+        action="store_true",
+        help="Do not let concurrent identical requests share upstream calls",
+    )
+    parser.add_argument(
+        "--replay", help="Serve upstream calls from this recorded traffic corpus"
+    )
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,176 @@
+"""
+Local stand-ins for the Groq and weatherapi backends with configurable
+latency, so the service's own overhead can be measured without the network.
+"""
+
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from generate_tasks import EXAMPLE_TASK
+from weekly_advisory import EXAMPLE_ADVISORY
+
+REPORT_RESPONSE = {
+    "report": "The crop is in the tillering stage and appears healthy with a uniform green canopy. "
+    "Soil moisture is adequate, no pests or diseases are visible and weed pressure is low.",
+    "summary": "Healthy crop at tillering with adequate moisture.",
+}
+
+
+class Latency:
+    """
+    Latency distribution in seconds.
+
+    Args:
+        mean: Mean latency
+        jitter: Spread around the mean (standard deviation for "normal" and
+            "lognormal", half-width for "uniform")
+        distribution: One of "fixed", "uniform", "normal" or "lognormal"
+    """
+
+    def __init__(self, mean, jitter=0.0, distribution="lognormal"):
+        self.mean = mean
+        self.jitter = jitter
+        self.distribution = distribution
+
+    def sample(self):
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "fixed" or self.jitter <= 0:
+            return self.mean
+        if self.distribution == "uniform":
+            return max(0.0, random.uniform(self.mean - self.jitter, self.mean + self.jitter))
+        if self.distribution == "normal":
+            return max(0.0, random.gauss(self.mean, self.jitter))
+        # Lognormal with the requested mean and standard deviation
+        sigma_squared = math.log(1 + (self.jitter / self.mean) ** 2)
+        mu = math.log(self.mean) - sigma_squared / 2
+        return random.lognormvariate(mu, math.sqrt(sigma_squared))
+
+    def wait(self):
+        time.sleep(self.sample())
+
+
+def _canned_content(messages):
+    content = messages[-1]["content"]
+    text = content if isinstance(content, str) else content[0]["text"]
+    if "weekly farm advisory" in text:
+        return json.dumps(EXAMPLE_ADVISORY)
+    if "weekly farm tasks" in text:
+        return json.dumps({"tasks": EXAMPLE_TASK})
+    return json.dumps(REPORT_RESPONSE)
+
+
+class _Completions:
+    def __init__(self, latency, chunk_size):
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def create(self, messages, model, stream=False, **kwargs):
+        self.latency.wait()
+        content = _canned_content(messages)
+        usage = SimpleNamespace(
+            prompt_tokens=len(json.dumps(messages)) // 4,
+            completion_tokens=len(content) // 4,
+            total_tokens=(len(json.dumps(messages)) + len(content)) // 4,
+        )
+        if stream:
+            return self._stream(content)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, content):
+        for start in range(0, len(content), self.chunk_size):
+            delta = SimpleNamespace(content=content[start : start + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeGroq:
+    """
+    Minimal Groq client returning canned report, task and advisory documents.
+    """
+
+    def __init__(self, latency, chunk_size=16):
+        self.chat = SimpleNamespace(completions=_Completions(latency, chunk_size))
+
+
+class _WeatherResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _forecast_day(date):
+    return {
+        "date": date,
+        "day": {
+            "condition": {"text": "Sunny"},
+            "maxtemp_c": 35.0,
+            "mintemp_c": 20.6,
+            "avgtemp_c": 27.8,
+            "avghumidity": 14,
+            "totalprecip_mm": 0.0,
+            "maxwind_kph": 18.7,
+        },
+    }
+
+
+class FakeWeatherSession:
+    """
+    Stand-in for the weatherapi requests.Session used by weather_service.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get(self, url, params=None, **kwargs):
+        self.latency.wait()
+        params = params or {}
+        if params.get("dt"):
+            dates = [params["dt"]]
+        else:
+            today = datetime.now()
+            dates = [
+                (today + timedelta(days=i)).strftime("%Y-%m-%d")
+                for i in range(int(params.get("days", 1)))
+            ]
+        return _WeatherResponse(
+            {"forecast": {"forecastday": [_forecast_day(date) for date in dates]}}
+        )
+
+
+def install(
+    llm_latency, weather_latency, use_caches=False, fake_backends=True, coalesce=True
+):
+    """
+    Point the service at the stand-ins. Images are passed through untouched
+    and, unless `use_caches` is set, the forecast and LLM caches are disabled
+    so every request exercises the full path. With `fake_backends` unset only
+    the rate limiter and caches are adjusted, e.g. for replaying a corpus.
+    Benchmark requests are identical, so `coalesce` can be unset to stop
+    concurrent ones from sharing upstream calls.
+    """
+    import image_preprocessing
+    import llm_client
+    import weather_service
+    from forecast_cache import forecast_cache
+    from llm_scheduler import LLMScheduler
+
+    llm_client.scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0)
+    image_preprocessing.IMAGE_PREPROCESSING = False
+    llm_client.llm_flight.enabled = coalesce
+    weather_service.weather_flight.enabled = coalesce
+    if fake_backends:
+        llm_client._client = llm_client._no_retry_client = FakeGroq(llm_latency)
+        fake_session = FakeWeatherSession(weather_latency)
+        weather_service._get_session = lambda: fake_session
+
+    if not use_caches:
+        forecast_cache.max_entries = 0
+        llm_client.is_cacheable = lambda temperature: False
@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking Groq calls hold a thread for seconds, so this pool bounds how many
+# generations a single worker keeps in flight
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", 64))
+# Concurrent get_weather calls from handlers. Each one waits on the fetch
+# pool in weather_service, whose WEATHER_MAX_PARALLEL bounds the calls
+# actually made to weatherapi
+WEATHER_MAX_WORKERS = int(os.getenv("WEATHER_MAX_WORKERS", 16))
+
+llm_executor = ThreadPoolExecutor(
+    max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm"
+)
+weather_executor = ThreadPoolExecutor(
+    max_workers=WEATHER_MAX_WORKERS, thread_name_prefix="weather-call"
+)
+
+# Calls submitted through run_in_executor that have not finished yet
+_in_flight = 0
+_idle = threading.Condition()
+
+
+def _tracked(call):
+    global _in_flight
+    try:
+        return call()
+    finally:
+        with _idle:
+            _in_flight -= 1
+            if not _in_flight:
+                _idle.notify_all()
+
+
+def wait_idle(timeout):
+    """
+    Block until every call handed to the executors has finished, without
+    shutting them down, so the pools stay usable afterwards.
+
+    Returns:
+        bool: False if calls were still running after `timeout` seconds
+    """
+    deadline = time.monotonic() + timeout
+    with _idle:
+        while _in_flight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _idle.wait(remaining)
+    return True
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """
+    Run a blocking function on `executor` without blocking the event loop.
+    The caller's context variables are carried over to the worker thread.
+    """
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    with _idle:
+        _in_flight += 1
+    try:
+        future = loop.run_in_executor(executor, _tracked, call)
+    except BaseException:
+        with _idle:
+            _in_flight -= 1
+        raise
+    return await future
+
+
+async def run_llm(func, *args, **kwargs):
+    return await run_in_executor(llm_executor, func, *args, **kwargs)
+
+
+async def run_weather(func, *args, **kwargs):
+    return await run_in_executor(weather_executor, func, *args, **kwargs)
@@ -1,36 +1,40 @@
+import contextvars
+import json
+import logging
 import os
-from typing import Dict, List, Union
-from groq import Groq
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-def generate_farm_report(
-    image_urls: Union[str, List[str]], parameters: Dict[str, str]
-) -> str:
-    """
-    Generate a detailed report about the farm based on the provided image URLs
-
-    Args:
-        image_urls: URL(s) to the image file(s)
-        parameters: Dictionary containing farm parameters
-
-    Returns:
-        Detailed farm report
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Union
+from executors import run_llm
+from image_preprocessing import PreparedImage, prepare_images
+from llm_cache import cache_key
+from llm_client import (
+    DEFAULT_MODEL,
+    create_chat_completion,
+    extract_json,
+    stream_chat_completion,
+)
+from prompts import PromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# Images per vision request; larger sets are analyzed in parallel groups
+REPORT_IMAGE_GROUP_SIZE = int(os.getenv("REPORT_IMAGE_GROUP_SIZE", 5))
+REPORT_MAX_PARALLEL_GROUPS = int(os.getenv("REPORT_MAX_PARALLEL_GROUPS", 8))
+
+_group_executor = ThreadPoolExecutor(
+    max_workers=REPORT_MAX_PARALLEL_GROUPS, thread_name_prefix="report-group"
+)
+
+REPORT_PROMPT = PromptTemplate(
     """
-    if isinstance(image_urls, str):
-        image_urls = [image_urls]
-
-    report_prompt = f"""
-    I am providing you images from a {parameters.get('crop', '')} farm in {parameters.get('farmLocation', '')}.
+    I am providing you images from a {crop} farm in {farmLocation}.
 
     Additional context:
-    - Growth stage: {parameters.get('currentGrowthStage', 'Not specified')}
-    - Soil type: {parameters.get('soilType', 'Not specified')}
-    - Current weather: {parameters.get('currentWeather', 'Not specified')}
-    - Sowing date: {parameters.get('sowingDate', 'Not specified')}
-    - Irrigation method: {parameters.get('irrigationType', 'Not specified')}
+    - Growth stage: {currentGrowthStage}
+    - Soil type: {soilType}
+    - Current weather: {currentWeather}
+    - Sowing date: {sowingDate}
+    - Irrigation method: {irrigationType}
 
     Your job is to act as a professional crop inspector and provide a comprehensive farm assessment report covering:
 
@@ -54,35 +58,187 @@ def generate_farm_report(
     "report": "add entire report here",
     "summary": "oneline summary"
     }}
+    """,
+    name="report",
+)
+
+MERGE_PROMPT = PromptTemplate(
     """
+    Below are partial crop inspection findings for a {crop} farm in {farmLocation}. Each finding covers a different set of observations of the same farm.
 
-    # Set up API client
-    api_key = os.getenv("GROQ_API_KEY")
-    # api_key = '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'
-    if not api_key:
-        raise ValueError("GROQ_API_KEY environment variable is not set")
+    {findings}
 
-    # Initialize Groq client with only the API key
-    client = Groq(api_key=api_key)
+    Merge these findings into a single comprehensive farm assessment report covering crop health, growth stage, soil condition, pests or diseases, weed pressure, irrigation efficiency and nutrient deficiencies. Resolve overlaps, keep every distinct observation, and speak as a professional crop inspector about the crop itself. Don't add any advice and be deterministic.
 
+    I want a paragraph format, with the last sentence summarizing your findings.
+    Return your response in this json format:
+    {{
+    "report": "add entire report here",
+    "summary": "oneline summary"
+    }}
+    """,
+    name="report_merge",
+)
+
+
+def _render_report_prompt(parameters: Dict[str, str]) -> str:
+    return REPORT_PROMPT.render(
+        crop=parameters.get("crop", ""),
+        farmLocation=parameters.get("farmLocation", ""),
+        currentGrowthStage=parameters.get("currentGrowthStage", "Not specified"),
+        soilType=parameters.get("soilType", "Not specified"),
+        currentWeather=parameters.get("currentWeather", "Not specified"),
+        sowingDate=parameters.get("sowingDate", "Not specified"),
+        irrigationType=parameters.get("irrigationType", "Not specified"),
+    )
+
+
+def _report_cache_key(
+    report_prompt: str, images: List[PreparedImage], **kwargs
+) -> str:
+    """
+    Response cache key for a report over `images`, built from the prompt and
+    the images' content hashes rather than their base64 payloads.
+    """
+    return cache_key(
+        [report_prompt, *(image.cache_id for image in images)], DEFAULT_MODEL, **kwargs
+    )
+
+
+def _report_messages(report_prompt: str, images: List[PreparedImage]) -> List[Dict]:
     # Create message content with text and images
     message_content = [{"type": "text", "text": report_prompt}]
-    
-    for url in image_urls:
+
+    for image in images:
         message_content.append(
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": url
+                    "url": image.payload
                     },
             }
         )
 
+    return [{"role": "user", "content": message_content}]
+
+
+def _analyze_group(report_prompt: str, images: List[PreparedImage]) -> str:
+    response_format = {"type": "json_object"}
+    return create_chat_completion(
+        model=DEFAULT_MODEL,
+        messages=_report_messages(report_prompt, images),
+        key=_report_cache_key(report_prompt, images, response_format=response_format),
+        response_format=response_format,
+        priority="report",
+    )
+
+
+def _final_report_messages(
+    report_prompt: str, images: List[PreparedImage], parameters: Dict[str, str]
+) -> List[Dict]:
+    """
+    Messages for the call that produces the report. Image sets up to
+    REPORT_IMAGE_GROUP_SIZE go in a single vision request. Larger sets are
+    analyzed in parallel groups first, and the final call is a text-only
+    merge of the partial findings. Groups that fail are left out of the
+    merge; the error is only raised if every group fails.
+    """
+    if len(images) <= REPORT_IMAGE_GROUP_SIZE:
+        return _report_messages(report_prompt, images)
+
+    groups = [
+        images[i : i + REPORT_IMAGE_GROUP_SIZE]
+        for i in range(0, len(images), REPORT_IMAGE_GROUP_SIZE)
+    ]
+    # Each group runs in its own copy of the caller's context (cache bypass, priority)
+    futures = [
+        _group_executor.submit(
+            contextvars.copy_context().run, _analyze_group, report_prompt, group
+        )
+        for group in groups
+    ]
+
+    findings = []
+    first_error = None
+    for number, future in enumerate(futures, start=1):
+        try:
+            content = future.result()
+        except Exception as e:
+            logger.error(f"Analysis of image group {number}/{len(groups)} failed: {str(e)}")
+            first_error = first_error or e
+            continue
+        try:
+            partial = extract_json(content)
+            finding = partial.get("report", content) if isinstance(partial, dict) else content
+        except json.JSONDecodeError:
+            finding = content
+        findings.append(f"Finding {number}: {finding}")
+    if not findings:
+        raise first_error
+
+    merge_prompt = MERGE_PROMPT.render(
+        crop=parameters.get("crop", ""),
+        farmLocation=parameters.get("farmLocation", ""),
+        findings="\n\n".join(findings),
+    )
+    return [{"role": "user", "content": merge_prompt}]
+
+
+def generate_farm_report(
+    image_urls: Union[str, List[str]], parameters: Dict[str, str]
+) -> str:
+    """
+    Generate a detailed report about the farm based on the provided image URLs.
+    Large image sets are analyzed in parallel groups and merged into one report.
+
+    Args:
+        image_urls: URL(s) to the image file(s)
+        parameters: Dictionary containing farm parameters
+
+    Returns:
+        Detailed farm report
+    """
+    if isinstance(image_urls, str):
+        image_urls = [image_urls]
+
+    report_prompt = _render_report_prompt(parameters)
+    images = prepare_images(image_urls)
+    response_format = {"type": "json_object"}
+    # Keyed on the prompt and images, so a cached report skips the group calls too
+    return create_chat_completion(
+        model=DEFAULT_MODEL,
+        messages=lambda: _final_report_messages(report_prompt, images, parameters),
+        key=_report_cache_key(report_prompt, images, response_format=response_format),
+        response_format=response_format,
+        priority="report",
+    )
+
+
+def stream_farm_report(
+    image_urls: Union[str, List[str]], parameters: Dict[str, str]
+) -> Iterator[str]:
+    """
+    Stream the farm report as content chunks while the model generates it.
+    Images are only fetched once iteration starts, off the event loop.
+    For large image sets only the final merge pass is streamed.
+    """
+    if isinstance(image_urls, str):
+        image_urls = [image_urls]
 
-    response = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role": "user", "content": message_content}],
-        response_format= { "type": "json_object" }
+    report_prompt = _render_report_prompt(parameters)
+    images = prepare_images(image_urls)
+    yield from stream_chat_completion(
+        model=DEFAULT_MODEL,
+        messages=lambda: _final_report_messages(report_prompt, images, parameters),
+        key=_report_cache_key(report_prompt, images, stream=True),
+        priority="report",
     )
 
-    return response.choices[0].message.content
+
+async def generate_farm_report_async(
+    image_urls: Union[str, List[str]], parameters: Dict[str, str]
+) -> str:
+    """
+    Async variant of generate_farm_report that runs on the bounded LLM executor.
+    """
+    return await run_llm(generate_farm_report, image_urls, parameters)
@@ -0,0 +1,97 @@
+import contextvars
+import json
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; clients then always get JSON
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# orjson.JSONDecodeError subclasses this, so callers catch a single type
+JSONDecodeError = json.JSONDecodeError
+
+# Set per request when the client accepts MessagePack
+prefers_msgpack = contextvars.ContextVar("prefers_msgpack", default=False)
+
+
+def _default(value):
+    # Records such as ForecastDay render their display form only when serialized
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def loads(data):
+    """
+    Parse a JSON document from str or bytes.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value):
+    """
+    Serialize to compact UTF-8 JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps_str(value):
+    """
+    Serialize to a compact JSON string.
+    """
+    if orjson is not None:
+        return dumps(value).decode("utf-8")
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def accepts_msgpack(accept):
+    """
+    Whether an Accept header asks for MessagePack ahead of JSON.
+    """
+    if msgpack is None or not accept:
+        return False
+    media_types = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    for media_type in media_types:
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return True
+        if media_type == "application/json":
+            return False
+    return False
+
+
+class APIResponse(JSONResponse):
+    """
+    JSON response encoded with orjson when it is installed, or MessagePack
+    when the request negotiated it. Returning one directly from a handler
+    also skips FastAPI's `jsonable_encoder` pass over the content.
+    """
+
+    def __init__(self, content, *args, **kwargs):
+        if msgpack is not None and prefers_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+        super().__init__(content, *args, **kwargs)
+        if msgpack is not None:
+            self.headers["vary"] = "Accept"
+
+    def render(self, content):
+        if self.media_type in MSGPACK_MEDIA_TYPES:
+            return msgpack.packb(content, default=_default, use_bin_type=True)
+        return dumps(content)
@@ -0,0 +1,110 @@
+import sys
+
+
+class ForecastDay:
+    """
+    One forecast day as raw numbers. Cached and passed around in this form;
+    the display strings of the `/weather` response are only built when a
+    response or prompt is rendered, by `as_dict`.
+    """
+
+    __slots__ = (
+        "condition",
+        "max_temp_c",
+        "min_temp_c",
+        "avg_temp_c",
+        "humidity",
+        "precip_mm",
+        "wind_kph",
+        "stale",
+    )
+
+    def __init__(
+        self,
+        condition,
+        max_temp_c,
+        min_temp_c,
+        avg_temp_c,
+        humidity,
+        precip_mm,
+        wind_kph,
+        stale=False,
+    ):
+        # A handful of condition texts repeat across every cached day
+        self.condition = sys.intern(condition)
+        self.max_temp_c = max_temp_c
+        self.min_temp_c = min_temp_c
+        self.avg_temp_c = avg_temp_c
+        self.humidity = humidity
+        self.precip_mm = precip_mm
+        self.wind_kph = wind_kph
+        self.stale = stale
+
+    @classmethod
+    def from_api(cls, day_data):
+        """
+        Build a record from the `day` object of a weatherapi forecast day.
+        """
+        return cls(
+            day_data["condition"]["text"],
+            float(day_data["maxtemp_c"]),
+            float(day_data["mintemp_c"]),
+            float(day_data["avgtemp_c"]),
+            float(day_data["avghumidity"]),
+            float(day_data["totalprecip_mm"]),
+            float(day_data["maxwind_kph"]),
+        )
+
+    def as_stale(self):
+        """
+        Copy of this day marked as served from an expired cache entry.
+        """
+        return ForecastDay(
+            self.condition,
+            self.max_temp_c,
+            self.min_temp_c,
+            self.avg_temp_c,
+            self.humidity,
+            self.precip_mm,
+            self.wind_kph,
+            stale=True,
+        )
+
+    def as_dict(self):
+        """
+        The day in the display format of the `/weather` response.
+        """
+        rendered = {
+            "Condition": self.condition,
+            "Max Temp": f"{self.max_temp_c}°C )",
+            "Min Temp": f"{self.min_temp_c}°C ",
+            "Avg Temp": f"{self.avg_temp_c}°C ",
+            "Humidity": f"{self.humidity:g}%",
+            "Precipitation": f"{self.precip_mm} mm",
+            "Wind": f"{self.wind_kph} kph",
+        }
+        if self.stale:
+            rendered["Stale"] = True
+        return rendered
+
+    def __repr__(self):
+        return f"ForecastDay({self.condition!r}, max={self.max_temp_c}, min={self.min_temp_c})"
+
+
+def render_forecast(forecast):
+    """
+    Render a forecast from `get_weather` in the `/weather` response format.
+    Error entries are returned unchanged.
+
+    Args:
+        forecast (dict): ForecastDay or error entry by date, or an error dict
+
+    Returns:
+        dict: Display dict by date
+    """
+    if not isinstance(forecast, dict):
+        return forecast
+    return {
+        date: day.as_dict() if isinstance(day, ForecastDay) else day
+        for date, day in forecast.items()
+    }
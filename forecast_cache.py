@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from locations import location_key
+from metrics import record_cache
+
+# (max lead days, ttl seconds): near days change more often than far ones
+DEFAULT_TTL_TIERS = (
+    (0, 30 * 60),
+    (2, 60 * 60),
+    (6, 3 * 60 * 60),
+    (None, 6 * 60 * 60),
+)
+
+
+class ForecastCache:
+    """
+    In-process LRU cache of ForecastDay records keyed by (canonical location, date).
+    Entries expire after a TTL that grows with how far ahead the day is.
+    Expired entries are kept for up to `stale_max_age` seconds longer so they
+    can still be served, marked stale, when the upstream is unavailable.
+    """
+
+    def __init__(
+        self, max_entries=4096, ttl_tiers=DEFAULT_TTL_TIERS, stale_max_age=24 * 60 * 60
+    ):
+        self.max_entries = max_entries
+        self.ttl_tiers = ttl_tiers
+        self.stale_max_age = stale_max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, lead_days):
+        for max_lead, ttl in self.ttl_tiers:
+            if max_lead is None or lead_days <= max_lead:
+                return ttl
+        return self.ttl_tiers[-1][1]
+
+    def get(self, location, date):
+        key = (location_key(location), date)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None and entry[0] + self.stale_max_age <= now:
+                    del self._entries[key]
+                self.misses += 1
+                record_cache("forecast", False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        record_cache("forecast", True)
+        return entry[1]
+
+    def get_many(self, location, dates):
+        """
+        Returns:
+            dict: Cached forecast for each date that is present and fresh
+        """
+        found = {}
+        for date in dates:
+            value = self.get(location, date)
+            if value is not None:
+                found[date] = value
+        return found
+
+    def get_stale(self, location, date, max_age=None):
+        """
+        Return an entry that expired at most `max_age` seconds ago
+        (`stale_max_age` by default), or None. Fresh entries are not returned.
+        """
+        max_age = self.stale_max_age if max_age is None else min(max_age, self.stale_max_age)
+        key = (location_key(location), date)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] > now or entry[0] + max_age <= now:
+            return None
+        return entry[1]
+
+    def get_stale_many(self, location, dates, max_age=None):
+        found = {}
+        for date in dates:
+            value = self.get_stale(location, date, max_age)
+            if value is not None:
+                found[date] = value
+        return found
+
+    def set(self, location, date, value, lead_days=0):
+        key = (location_key(location), date)
+        expires_at = time.monotonic() + self.ttl_for(lead_days)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, location=None, date=None):
+        """
+        Drop entries matching the given location and/or date; drop everything
+        when neither is given.
+
+        Returns:
+            int: Number of entries removed
+        """
+        normalized = location_key(location) if location is not None else None
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (normalized is None or key[0] == normalized)
+                and (date is None or key[1] == date)
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+forecast_cache = ForecastCache(
+    max_entries=int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", 4096)),
+    stale_max_age=float(os.getenv("FORECAST_STALE_MAX_AGE", 24 * 60 * 60)),
+)
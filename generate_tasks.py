@@ -1,7 +1,9 @@
-import os
-import json
-from groq import Groq
+import textwrap
 from datetime import datetime
+from executors import run_llm
+from llm_client import DEFAULT_MODEL, create_chat_completion, stream_chat_completion
+from prompts import PromptTemplate, compact_json
+from task_lists import tasks_prompt_json
 
 EXAMPLE_TASK = [
     {
@@ -29,21 +31,7 @@ EXAMPLE_TASK = [
 ]
 
 
-def generate_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
-    """
-    Generate weekly farm tasks based on farm report, parameters, and previous tasks status
-    with enhanced features for dependencies.
-
-    Args:
-        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
-        farm_report: String containing the latest farm condition report
-        example_tasks: Example tasks to guide the LLM (optional)
-
-    Returns:
-        JSON formatted tasks for the upcoming week
-    """
-
-    dependencies_guidance = """
+DEPENDENCIES_GUIDANCE = """
     Tasks should include dependency information when applicable. Dependencies should be listed in the "dependencies" field and can reference:
     1. Previous tasks that must be completed first
     2. Conditions that must be met before task execution
@@ -59,33 +47,34 @@ def generate_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
     ```
     """
 
-    task_prompt = f"""
-    I need to generate comprehensive weekly farm tasks for a {parameters.get('crop', '')} farm in {parameters.get('farmLocation', '')}.
+TASK_PROMPT_TEMPLATE = PromptTemplate(
+    """
+    I need to generate comprehensive weekly farm tasks for a {crop} farm in {farmLocation}.
 
-    ## FARM REPORT (Generated on {datetime.now().strftime('%Y-%m-%d')}):
+    ## FARM REPORT (Generated on {today}):
     {farm_report}
 
     ## FARM PARAMETERS:
-    - Crop: {parameters.get('crop', '')}
-    - Location: {parameters.get('farmLocation', '')}
-    - Growth Stage: {parameters.get('currentGrowthStage', '')}
-    - Soil Type: {parameters.get('soilType', '')}
-    - Irrigation Type: {parameters.get('irrigationType', '')}
-    - Water Availability: {parameters.get('waterAvailabilityStatus', '')}
-    - Fertilizer Type: {parameters.get('fertilizersUsed', '')}
+    - Crop: {crop}
+    - Location: {farmLocation}
+    - Growth Stage: {currentGrowthStage}
+    - Soil Type: {soilType}
+    - Irrigation Type: {irrigationType}
+    - Water Availability: {waterAvailabilityStatus}
+    - Fertilizer Type: {fertilizersUsed}
 
     ## WEATHER FORECAST (Next 7 days):
-    {parameters.get('currentWeather', 'No weather data available')}
+    {currentWeather}
 
 
 
     ## PREVIOUS WEEK'S TASKS STATUS:
-    {parameters.get('previousTasks', 'This is the first week of task generation, no previous tasks available')}
+    {previousTasks}
     
 
     {dependencies_guidance}
 
-    Based on all the above information, generate 4-5 comprehensive agricultural tasks for the upcoming week. The tasks should be actionable, specific to the current farm conditions, prioritized appropriately, and incorporate local farming knowledge and practices from {parameters.get('farmLocation', '')}.
+    Based on all the above information, generate 4-5 comprehensive agricultural tasks for the upcoming week. The tasks should be actionable, specific to the current farm conditions, prioritized appropriately, and incorporate local farming knowledge and practices from {farmLocation}.
 
     Each task should include:
     1. A unique task ID (format: T-YYYY-MM-W##-##)
@@ -102,7 +91,7 @@ def generate_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
 
     If any previous tasks were not completed or marked as "In Progress", incorporate them into this week's tasks with appropriate priority adjustments if they are still relevant.
 
-    {f"Here is an example of tasks for reference: {json.dumps(example_tasks, indent=2)}" if example_tasks else ""}
+    {examples}
 
     Return your response as a valid JSON array with each task as a separate object. The JSON structure should look like this:
     tasks = [
@@ -132,20 +121,103 @@ def generate_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
       {{ ... }}
     ]
 
-    Make sure all tasks are relevant to the current farm conditions, growth stage, weather forecast. Use local terminology from {parameters.get('farmLocation', '')} where appropriate that would help farmers.
+    Make sure all tasks are relevant to the current farm conditions, growth stage, weather forecast. Use local terminology from {farmLocation} where appropriate that would help farmers.
+    """,
+    name="tasks",
+    dependencies_guidance=textwrap.dedent(DEPENDENCIES_GUIDANCE).strip(),
+)
+
+
+def _example_section(example_tasks):
+    if not example_tasks:
+        return ""
+    return f"Here is an example of tasks for reference: {compact_json(example_tasks)}"
+
+
+# The default example is serialized once at import instead of on every request
+TASK_PROMPT = TASK_PROMPT_TEMPLATE.partial(examples=_example_section(EXAMPLE_TASK))
+
+
+def build_tasks_prompt(parameters, farm_report, example_tasks=EXAMPLE_TASK):
     """
+    Build the task generation prompt.
 
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    Args:
+        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
+        farm_report: String containing the latest farm condition report
+        example_tasks: Example tasks to guide the LLM (optional)
 
-    response = client.chat.completions.create(
+    Returns:
+        Rendered prompt text
+    """
+    template = (
+        TASK_PROMPT
+        if example_tasks is EXAMPLE_TASK
+        else TASK_PROMPT_TEMPLATE.partial(examples=_example_section(example_tasks))
+    )
+
+    return template.render(
+        crop=parameters.get("crop", ""),
+        farmLocation=parameters.get("farmLocation", ""),
+        today=datetime.now().strftime("%Y-%m-%d"),
+        farm_report=farm_report,
+        currentGrowthStage=parameters.get("currentGrowthStage", ""),
+        soilType=parameters.get("soilType", ""),
+        irrigationType=parameters.get("irrigationType", ""),
+        waterAvailabilityStatus=parameters.get("waterAvailabilityStatus", ""),
+        fertilizersUsed=parameters.get("fertilizersUsed", ""),
+        currentWeather=parameters.get("currentWeather", "No weather data available"),
+        previousTasks=(
+            tasks_prompt_json(parameters["previousTasks"])
+            if parameters.get("previousTasks")
+            else "This is the first week of task generation, no previous tasks available"
+        ),
+    )
+
+
+def generate_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
+    """
+    Generate weekly farm tasks based on farm report, parameters, and previous tasks status
+    with enhanced features for dependencies.
+
+    Args:
+        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
+        farm_report: String containing the latest farm condition report
+        example_tasks: Example tasks to guide the LLM (optional)
+
+    Returns:
+        JSON formatted tasks for the upcoming week
+    """
+    task_prompt = build_tasks_prompt(parameters, farm_report, example_tasks)
+
+    return create_chat_completion(
         messages=[{"role": "user", "content": task_prompt}],
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        temperature=1,  
+        model=DEFAULT_MODEL,
+        temperature=1,
         response_format={"type": "json_object"},
+        priority="tasks",
     )
 
-    return response.choices[0].message.content
 
+def stream_farm_tasks(parameters, farm_report, example_tasks=EXAMPLE_TASK):
+    """
+    Stream the generated tasks as content chunks while the model generates them.
+    """
+    task_prompt = build_tasks_prompt(parameters, farm_report, example_tasks)
+
+    return stream_chat_completion(
+        messages=[{"role": "user", "content": task_prompt}],
+        model=DEFAULT_MODEL,
+        temperature=1,
+        priority="tasks",
+    )
+
+
+async def generate_farm_tasks_async(parameters, farm_report, example_tasks=EXAMPLE_TASK):
+    """
+    Async variant of generate_farm_tasks that runs on the bounded LLM executor.
+    """
+    return await run_llm(generate_farm_tasks, parameters, farm_report, example_tasks)
 
 
 if __name__ == "__main__":
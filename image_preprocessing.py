@@ -0,0 +1,282 @@
+import base64
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import traffic_replay
+from metrics import record_cache, timed
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then only deduplicated by content
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREPROCESSING = os.getenv("IMAGE_PREPROCESSING", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1024))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 512 * 1024))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", 15))
+# Downloads larger than this are abandoned and the URL is passed to the model instead
+IMAGE_FETCH_MAX_BYTES = int(os.getenv("IMAGE_FETCH_MAX_BYTES", 20 * 1024 * 1024))
+IMAGE_MAX_PARALLEL = int(os.getenv("IMAGE_MAX_PARALLEL", 8))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", 128))
+# Max Hamming distance between difference hashes for two shots to count as the same
+IMAGE_DEDUPE_DISTANCE = int(os.getenv("IMAGE_DEDUPE_DISTANCE", 4))
+
+_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_MAX_PARALLEL, thread_name_prefix="image-fetch"
+)
+_session = None
+_session_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class PreparedImage:
+    __slots__ = ("url", "payload", "content_hash", "dhash")
+
+    def __init__(self, url, payload, content_hash=None, dhash=None):
+        self.url = url
+        self.payload = payload
+        self.content_hash = content_hash
+        self.dhash = dhash
+
+    @property
+    def cache_id(self):
+        """
+        Identity of the image for response cache keys: its content hash, or
+        the URL when it was not downloaded.
+        """
+        return self.content_hash or self.url
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_maxsize=IMAGE_MAX_PARALLEL))
+                _session = session
+    return _session
+
+
+class ImageFetchRefused(Exception):
+    """
+    Raised when an image URL may not be fetched by the server.
+    """
+
+
+def _check_fetchable(url):
+    """
+    Only https URLs whose host resolves exclusively to public addresses are
+    fetched, so client-supplied URLs cannot reach internal services.
+
+    Raises:
+        ImageFetchRefused: If the URL must not be fetched
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port or 443
+    except ValueError:
+        raise ImageFetchRefused("malformed URL")
+    if parts.scheme != "https" or not parts.hostname:
+        raise ImageFetchRefused("only https URLs are fetched")
+    try:
+        addresses = socket.getaddrinfo(
+            parts.hostname, port, type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError) as e:
+        raise ImageFetchRefused(f"cannot resolve host: {str(e)}")
+    for address in addresses:
+        _check_public(address[4][0])
+
+
+def _check_public(address):
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    if not ip.is_global or ip.is_multicast:
+        raise ImageFetchRefused(f"host resolves to non-public address {ip}")
+
+
+def _download(url):
+    """
+    Download an image, reading at most IMAGE_FETCH_MAX_BYTES. Redirects are
+    not followed, since their target has not been checked.
+
+    Returns:
+        tuple: Body bytes and content type
+
+    Raises:
+        ImageFetchRefused: If the URL must not be fetched or the body is too large
+        requests.RequestException: If the download fails
+    """
+    _check_fetchable(url)
+    with _get_session().get(
+        url, timeout=IMAGE_FETCH_TIMEOUT, stream=True, allow_redirects=False
+    ) as response:
+        # The host is resolved again when connecting, so check the address actually used
+        connection = getattr(response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            _check_public(sock.getpeername()[0])
+        response.raise_for_status()
+        if response.is_redirect:
+            raise ImageFetchRefused("redirects are not followed")
+        if int(response.headers.get("Content-Length") or 0) > IMAGE_FETCH_MAX_BYTES:
+            raise ImageFetchRefused("image exceeds IMAGE_FETCH_MAX_BYTES")
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > IMAGE_FETCH_MAX_BYTES:
+                raise ImageFetchRefused("image exceeds IMAGE_FETCH_MAX_BYTES")
+            chunks.append(chunk)
+        return b"".join(chunks), response.headers.get("Content-Type", "image/jpeg")
+
+
+def _log_host(url):
+    # Only the host is logged; paths and queries of signed URLs carry tokens
+    try:
+        return urlsplit(url).hostname or "unknown host"
+    except ValueError:
+        return "malformed URL"
+
+
+def _data_url(data, content_type):
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _difference_hash(image):
+    """
+    64-bit perceptual hash comparing neighbouring pixels of a 9x8 thumbnail.
+    """
+    pixels = list(image.convert("L").resize((9, 8)).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            value = (value << 1) | (left > pixels[row * 9 + col + 1])
+    return value
+
+
+def _encode_within_budget(image):
+    """
+    Downscale to IMAGE_MAX_DIMENSION and re-encode as JPEG, lowering quality
+    and size until the result fits IMAGE_MAX_BYTES.
+    """
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+    quality = IMAGE_JPEG_QUALITY
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= IMAGE_MAX_BYTES or min(image.size) <= 256:
+            return data
+        if quality > 60:
+            quality -= 10
+        else:
+            image.thumbnail((int(image.width * 0.75), int(image.height * 0.75)))
+
+
+def _prepare(url):
+    with _cache_lock:
+        cached = _cache.get(url)
+        if cached is not None:
+            _cache.move_to_end(url)
+    if cached is not None:
+        record_cache("image", True)
+        return cached
+    record_cache("image", False)
+
+    try:
+        raw, content_type = _download(url)
+    except (requests.RequestException, ImageFetchRefused) as e:
+        # Leave it to the model to fetch the original URL. Request errors
+        # quote the URL, so only their type is logged
+        reason = str(e) if isinstance(e, ImageFetchRefused) else type(e).__name__
+        logger.warning(f"Failed to download image from {_log_host(url)}: {reason}")
+        return PreparedImage(url, url)
+
+    content_hash = hashlib.sha256(raw).hexdigest()
+    prepared = None
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(raw)) as image:
+                dhash = _difference_hash(image)
+                payload = _data_url(_encode_within_budget(image), "image/jpeg")
+            prepared = PreparedImage(url, payload, content_hash, dhash)
+        except Image.DecompressionBombError as e:
+            # Never forward the bytes; the model fetches and limits the original itself
+            logger.warning(f"Refused oversized image from {_log_host(url)}: {str(e)}")
+            prepared = PreparedImage(url, url, content_hash)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to decode image from {_log_host(url)}: {str(e)}")
+    if prepared is None:
+        payload = _data_url(raw, content_type) if len(raw) <= IMAGE_MAX_BYTES else url
+        prepared = PreparedImage(url, payload, content_hash)
+
+    with _cache_lock:
+        _cache[url] = prepared
+        _cache.move_to_end(url)
+        while len(_cache) > IMAGE_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return prepared
+
+
+@timed("image_preprocess")
+def prepare_images(image_urls):
+    """
+    Download images concurrently, downscale and re-encode them to the size
+    budget, and drop duplicates by content or perceptual hash.
+
+    Args:
+        image_urls: Image URLs as sent by the client
+
+    Returns:
+        list: PreparedImage per distinct image. Its payload is a base64 data
+        URL where the image could be downloaded and the original URL
+        otherwise. Nothing is downloaded when replaying recorded traffic.
+    """
+    if not IMAGE_PREPROCESSING or traffic_replay.TRAFFIC_MODE == "replay":
+        return [PreparedImage(url, url) for url in image_urls]
+
+    unique_urls = list(dict.fromkeys(image_urls))
+    prepared_images = list(_executor.map(_prepare, unique_urls))
+
+    images = []
+    content_hashes = set()
+    dhashes = []
+    for prepared in prepared_images:
+        if prepared.content_hash is not None:
+            if prepared.content_hash in content_hashes:
+                continue
+            content_hashes.add(prepared.content_hash)
+        if prepared.dhash is not None:
+            if any(
+                bin(prepared.dhash ^ seen).count("1") <= IMAGE_DEDUPE_DISTANCE
+                for seen in dhashes
+            ):
+                continue
+            dhashes.append(prepared.dhash)
+        images.append(prepared)
+
+    if len(images) < len(image_urls):
+        logger.info(f"Dropped {len(image_urls) - len(images)} duplicate images")
+    return images
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from executors import run_in_executor, wait_idle, weather_executor
+
+logger = logging.getLogger(__name__)
+
+# How long shutdown waits for queued LLM and weather work to finish
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 120))
+
+_ready = threading.Event()
+_status = {"state": "starting", "error": None, "warmup_seconds": None}
+
+
+def readiness():
+    """
+    Returns:
+        tuple: Whether the worker is ready for traffic, and a status dict
+    """
+    return _ready.is_set(), dict(_status)
+
+
+def warmup():
+    """
+    Create the shared clients, connection pools and cache connections before
+    the worker reports ready, so the first requests do not pay for them.
+    """
+    import traffic_replay
+    import weather_service
+    from llm_cache import llm_cache
+    from llm_client import get_client
+    from weather_prefetch import (
+        WEATHER_PREFETCH_ENABLED,
+        WEATHER_PREFETCH_WARMUP_TIMEOUT,
+        prefetcher,
+    )
+
+    started = time.perf_counter()
+    try:
+        if traffic_replay.TRAFFIC_MODE != "replay":
+            get_client()
+        weather_service._get_session()
+        llm_cache.stats()
+        if WEATHER_PREFETCH_ENABLED:
+            # Forecasts for the persisted hot locations are cached before taking traffic
+            prefetcher.start()
+            if not prefetcher.warmed.wait(WEATHER_PREFETCH_WARMUP_TIMEOUT):
+                logger.warning("Weather prefetch warmup still running, continuing startup")
+    except Exception as e:
+        _status.update(state="failed", error=str(e))
+        logger.error(f"Warmup failed: {str(e)}")
+        return
+
+    _status.update(
+        state="ready", warmup_seconds=round(time.perf_counter() - started, 3)
+    )
+    _ready.set()
+
+
+async def warmup_async():
+    await run_in_executor(weather_executor, warmup)
+
+
+def begin_drain():
+    """
+    Report not ready from now on. Called when the worker receives SIGTERM,
+    while it is still serving, so probes see it draining before it stops.
+    """
+    _ready.clear()
+    _status["state"] = "draining"
+
+
+async def drain(timeout=SHUTDOWN_DRAIN_TIMEOUT):
+    """
+    Stop reporting ready and wait up to `timeout` seconds for LLM and
+    weather calls already handed to the executors to complete. The
+    executors stay usable, so a later warmup in the same process works.
+    """
+    from weather_prefetch import prefetcher
+
+    begin_drain()
+    prefetcher.stop()
+    started = time.perf_counter()
+    idle = await asyncio.get_running_loop().run_in_executor(None, wait_idle, timeout)
+    if not idle:
+        logger.error(f"Shutdown drain timed out after {timeout:.0f}s")
+    else:
+        logger.info(f"Drained in-flight work in {time.perf_counter() - started:.2f}s")
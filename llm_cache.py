@@ -0,0 +1,207 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import record_cache
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 6 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1024))
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", 50000))
+# Path to a SQLite file for the on-disk tier; unset keeps the cache in memory only
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")
+# Completions sampled above this temperature are only cached when opted in
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", 0.2))
+LLM_CACHE_NONDETERMINISTIC = os.getenv("LLM_CACHE_NONDETERMINISTIC", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Set per request (e.g. from an X-Cache-Bypass header) to skip cache reads
+cache_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+def cache_key(messages, model, temperature=None, **kwargs):
+    """
+    Content address of a completion request: the rendered messages (prompt
+    text and image URLs), model, temperature and remaining completion options.
+    """
+    payload = json.dumps(
+        {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "options": kwargs,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature):
+    """
+    Deterministic-enough completions are cached by default; the rest only
+    when LLM_CACHE_NONDETERMINISTIC is enabled. Groq samples at temperature
+    1 when none is given.
+    """
+    if LLM_CACHE_NONDETERMINISTIC:
+        return True
+    if temperature is None:
+        temperature = 1.0
+    return temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+
+class _DiskTier:
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pid = None
+        self._db = None
+
+    @property
+    def _conn(self):
+        # SQLite connections must not cross fork, so each server worker
+        # opens its own; WAL lets the workers share the file
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+            conn.commit()
+            self._db = conn
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None, None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key, value, expires_at):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of completion contents: an in-memory LRU in front of an
+    optional SQLite file. Both tiers expire entries after `ttl` seconds.
+    """
+
+    def __init__(self, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES, db_path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(db_path, LLM_CACHE_DISK_MAX_ENTRIES) if db_path else None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache("llm", True)
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        if self._disk is not None:
+            value, expires_at = self._disk.get(key)
+            if value is not None:
+                self._remember(key, value, expires_at)
+                with self._lock:
+                    self.hits += 1
+                record_cache("llm", True)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        record_cache("llm", False)
+        return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            self._disk.set(key, value, expires_at)
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+        if self._disk is not None:
+            stats["disk_entries"] = len(self._disk)
+        return stats
+
+
+llm_cache = LLMResponseCache(db_path=LLM_CACHE_DB)
@@ -0,0 +1,256 @@
+import os
+import threading
+import httpx
+from groq import APIStatusError, Groq
+from dotenv import load_dotenv
+from fast_json import JSONDecodeError, loads
+from llm_cache import cache_bypass, cache_key, is_cacheable, llm_cache
+from llm_scheduler import scheduler
+from metrics import observe_stage, record_tokens, record_upstream, timed
+from singleflight import SingleFlight
+from traffic_replay import groq_create
+
+load_dotenv()
+
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 100))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", 20))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", 60))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", 120))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", 10))
+# SDK retries for unscheduled use of get_client(); scheduled calls never retry in the SDK
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 2))
+
+
+class _PooledTransport(httpx.HTTPTransport):
+    """
+    HTTP transport that counts requests and newly opened connections so
+    connection reuse can be observed.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.connections_created = 0
+        self._lock = threading.Lock()
+
+        create_connection = self._pool.create_connection
+
+        def counted_create_connection(origin):
+            with self._lock:
+                self.connections_created += 1
+            return create_connection(origin)
+
+        self._pool.create_connection = counted_create_connection
+
+    def handle_request(self, request):
+        with self._lock:
+            self.requests += 1
+        return super().handle_request(request)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_created": self.connections_created,
+                "connections_reused": max(0, self.requests - self.connections_created),
+                "open_connections": len(self._pool.connections),
+            }
+
+
+llm_flight = SingleFlight("llm")
+
+_client = None
+_no_retry_client = None
+_transport = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Groq:
+    """
+    Return the process-wide Groq client, creating it on first use.
+    All generators share its connection pool and TLS sessions.
+    """
+    global _client, _transport
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv("GROQ_API_KEY")
+                if not api_key:
+                    raise ValueError("GROQ_API_KEY environment variable is not set")
+
+                _transport = _PooledTransport(
+                    limits=httpx.Limits(
+                        max_connections=GROQ_MAX_CONNECTIONS,
+                        max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+                        keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+                    ),
+                )
+                timeout = httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+                _client = Groq(
+                    api_key=api_key,
+                    timeout=timeout,
+                    max_retries=GROQ_MAX_RETRIES,
+                    http_client=httpx.Client(transport=_transport, timeout=timeout),
+                )
+    return _client
+
+
+def client_stats():
+    """
+    Connection pool counters for the shared client.
+    """
+    if _transport is None:
+        return {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "open_connections": 0,
+        }
+    return _transport.stats()
+
+
+def _scheduled_client():
+    """
+    The shared client with SDK retries off. Scheduled calls leave 429
+    handling to the scheduler, which backs off and retries within its
+    token buckets; SDK retries would bypass both.
+    """
+    global _no_retry_client
+    if _no_retry_client is None:
+        _no_retry_client = get_client().with_options(max_retries=0)
+    return _no_retry_client
+
+
+def _send(**kwargs):
+    return _scheduled_client().chat.completions.create(**kwargs)
+
+
+def _create(**kwargs):
+    try:
+        response = groq_create(_send, **kwargs)
+    except APIStatusError as e:
+        record_upstream("groq", e.status_code)
+        raise
+    record_upstream("groq", 200)
+    return response
+
+
+def create_chat_completion(
+    messages, model=DEFAULT_MODEL, cache=None, priority=None, key=None, **kwargs
+) -> str:
+    """
+    Run a chat completion on the shared client, going through the response
+    cache when the request is cacheable and through the rate-limit scheduler
+    otherwise. Concurrent identical requests are coalesced into one call.
+
+    Args:
+        messages: Chat messages in the OpenAI/Groq format, or a function
+            returning them that is only called on a cache miss. A function
+            requires `key`.
+        model: Model name
+        cache: None caches deterministic requests only, True always caches,
+            False skips the response cache
+        priority: Scheduler queue (report, tasks, advisory or batch)
+        key: Cache and coalescing key to use instead of hashing the messages,
+            e.g. one built from image content hashes
+        **kwargs: Extra completion arguments (temperature, response_format, ...)
+
+    Returns:
+        Content of the first choice
+    """
+    use_cache = cache if cache is not None else is_cacheable(kwargs.get("temperature"))
+    if key is None:
+        key = cache_key(messages, model, **kwargs)
+    # A bypassed request still refreshes the entry with its fresh result
+    if use_cache and not cache_bypass.get():
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def send():
+        prompt = messages() if callable(messages) else messages
+
+        def call():
+            with observe_stage("llm_call"):
+                response = _create(messages=prompt, model=model, **kwargs)
+            usage = getattr(response, "usage", None)
+            record_tokens(model, usage)
+            return response.choices[0].message.content, getattr(usage, "total_tokens", None)
+
+        return scheduler.run(call, prompt, priority)
+
+    # Identical prompts in flight at the same time share one upstream call
+    content = llm_flight.do(key, send)
+
+    if use_cache and content:
+        llm_cache.set(key, content)
+    return content
+
+
+def stream_chat_completion(
+    messages, model=DEFAULT_MODEL, cache=None, priority=None, key=None, **kwargs
+):
+    """
+    Stream a chat completion on the shared client, yielding content chunks as
+    they arrive. Groq's JSON mode cannot be combined with streaming, so callers
+    parse the joined output with `extract_json`.
+
+    A cached response is yielded as a single chunk; a fresh one is cached
+    once the stream completes. As with create_chat_completion, `key`
+    replaces the key derived from the messages, and `messages` may be a
+    function that is only called on a cache miss.
+    """
+    use_cache = cache if cache is not None else is_cacheable(kwargs.get("temperature"))
+    if not use_cache:
+        key = None
+    elif key is None:
+        key = cache_key(messages, model, stream=True, **kwargs)
+    if key is not None and not cache_bypass.get():
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    if callable(messages):
+        messages = messages()
+
+    stream = scheduler.run(
+        lambda: (
+            _create(messages=messages, model=model, stream=True, **kwargs),
+            None,
+        ),
+        messages,
+        priority,
+    )
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    if key is not None and content:
+        llm_cache.set(key, content)
+
+
+@timed("json_parse")
+def extract_json(content):
+    """
+    Parse a JSON document from model output, tolerating prose or code fences
+    around it.
+
+    Raises:
+        json.JSONDecodeError: If no JSON document can be parsed
+    """
+    try:
+        return loads(content)
+    except JSONDecodeError:
+        starts = [i for i in (content.find("{"), content.find("[")) if i != -1]
+        end = max(content.rfind("}"), content.rfind("]"))
+        if not starts or end <= min(starts):
+            raise
+        return loads(content[min(starts) : end + 1])
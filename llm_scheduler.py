@@ -0,0 +1,277 @@
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from groq import RateLimitError
+
+# Lower value is served first
+PRIORITIES = {"report": 0, "tasks": 1, "advisory": 2, "batch": 3}
+
+# Account-wide Groq quotas. Each server process admits calls against an
+# equal share, so the upstream sees the configured totals however many
+# workers run (server.py sets SERVER_WORKERS).
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", 30))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", 30000))
+SERVER_WORKERS = max(1, int(os.getenv("SERVER_WORKERS", 1)))
+# Completion tokens reserved up front; corrected once real usage is known
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", 1500))
+LLM_IMAGE_TOKEN_ESTIMATE = int(os.getenv("LLM_IMAGE_TOKEN_ESTIMATE", 1000))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 2))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 60))
+# Calls are shed rather than queued past these limits; 0 disables a limit
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", 200))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", 60))
+
+# Overrides the per-call priority, e.g. for work submitted by batch endpoints
+priority_override = contextvars.ContextVar("llm_priority_override", default=None)
+
+
+class LLMQueueFull(Exception):
+    """
+    Raised when a call is shed because the scheduler queue is full or the
+    call waited longer than LLM_MAX_QUEUE_WAIT. `retry_after` is a hint in
+    whole seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(messages):
+    """
+    Rough token estimate for a request: ~4 characters per prompt token, a
+    fixed cost per image and the reserved completion budget.
+    """
+    tokens = LLM_COMPLETION_TOKEN_ESTIMATE
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            elif part.get("type") == "image_url":
+                tokens += LLM_IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute / 60)
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until `amount` tokens are available.
+        """
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.per_minute
+
+    def consume(self, amount):
+        """
+        Take up to `amount` tokens; a single call never takes more than the
+        bucket holds.
+
+        Returns:
+            float: Tokens actually taken
+        """
+        if not self.per_minute:
+            return 0
+        taken = min(amount, self.capacity)
+        self.tokens -= taken
+        return taken
+
+    def adjust(self, delta):
+        """
+        Correct a previous reservation; the balance may go negative.
+        """
+        if self.per_minute:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls in priority order while keeping within the upstream
+    requests-per-minute and tokens-per-minute budgets, and pauses all calls
+    after the upstream answers 429.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=GROQ_REQUESTS_PER_MINUTE / SERVER_WORKERS,
+        tokens_per_minute=GROQ_TOKENS_PER_MINUTE / SERVER_WORKERS,
+        max_queue_depth=LLM_MAX_QUEUE_DEPTH,
+        max_queue_wait=LLM_MAX_QUEUE_WAIT,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait = max_queue_wait
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._consecutive_limits = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, priority, estimated_tokens):
+        """
+        Block until the call may be sent.
+
+        Returns:
+            float: Tokens reserved for the call, to reconcile with its usage
+
+        Raises:
+            LLMQueueFull: When the queue is full, or the call is still queued
+                after `max_queue_wait` seconds
+        """
+        ticket = (PRIORITIES.get(priority, len(PRIORITIES)), next(self._seq))
+        start = time.monotonic()
+        deadline = start + self.max_queue_wait if self.max_queue_wait else None
+        with self._cond:
+            if self.max_queue_depth and len(self._queue) >= self.max_queue_depth:
+                self.shed += 1
+                raise LLMQueueFull("LLM queue is full", self._retry_hint(start))
+            heapq.heappush(self._queue, ticket)
+            while True:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self.shed += 1
+                    self._cond.notify_all()
+                    raise LLMQueueFull("Timed out in the LLM queue", self._retry_hint(now))
+                timeout = deadline - now if deadline is not None else None
+                if self._queue[0] != ticket:
+                    self._cond.wait(timeout)
+                    continue
+                delay = max(
+                    self._paused_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(estimated_tokens, now),
+                )
+                if delay <= 0:
+                    break
+                self._cond.wait(delay if timeout is None else min(delay, timeout))
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            reserved = self.tokens.consume(estimated_tokens)
+            waited = time.monotonic() - start
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self._cond.notify_all()
+        return reserved
+
+    def _retry_hint(self, now):
+        """
+        Seconds until the calls queued now are likely admitted, at least 1.
+        """
+        drain = 0.0
+        if self.requests.per_minute:
+            drain = len(self._queue) * 60 / self.requests.per_minute
+        return max(1, math.ceil(max(drain, self._paused_until - now)))
+
+    def record_usage(self, reserved_tokens, actual_tokens):
+        with self._cond:
+            self.tokens.adjust(actual_tokens - reserved_tokens)
+            self._consecutive_limits = 0
+
+    def backoff(self, retry_after=None):
+        """
+        Pause admissions after a 429, honouring Retry-After when given and
+        backing off exponentially otherwise.
+        """
+        with self._cond:
+            self.rate_limited += 1
+            self._consecutive_limits += 1
+            if retry_after is None:
+                retry_after = min(
+                    LLM_BACKOFF_MAX, LLM_BACKOFF_BASE ** self._consecutive_limits
+                )
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + retry_after
+            )
+            self._cond.notify_all()
+
+    def run(self, call, messages, priority):
+        """
+        Run `call()` once admitted, retrying on 429 after backing off.
+        `call` returns a tuple of (result, total tokens used or None).
+        """
+        priority = priority_override.get() or priority
+        estimated = estimate_tokens(messages)
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            reserved = self.acquire(priority, estimated)
+            try:
+                result, used = call()
+            except RateLimitError as e:
+                self.backoff(_retry_after(e))
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                continue
+            if used is not None:
+                self.record_usage(reserved, used)
+            return result
+
+    def stats(self):
+        with self._cond:
+            waiting = {}
+            for priority_value, _ in self._queue:
+                name = next(
+                    (k for k, v in PRIORITIES.items() if v == priority_value), "other"
+                )
+                waiting[name] = waiting.get(name, 0) + 1
+            return {
+                "queue_depth": len(self._queue),
+                "waiting_by_priority": waiting,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "shed": self.shed,
+                "avg_wait_seconds": self.total_wait / self.admitted
+                if self.admitted
+                else 0.0,
+                "max_wait_seconds": self.max_wait,
+                "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+scheduler = LLMScheduler()
@@ -0,0 +1,245 @@
+import functools
+import json
+import logging
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Optional JSON gazetteer merged over the built-in one:
+# {"Canonical Name": {"query": "...", "aliases": ["...", ...]}}
+LOCATION_GAZETTEER_PATH = os.getenv("LOCATION_GAZETTEER_PATH")
+# Coordinates are snapped to a grid of this many degrees (0.1 is about 11 km)
+LOCATION_GRID_DEGREES = float(os.getenv("LOCATION_GRID_DEGREES", 0.1))
+LOCATION_CACHE_SIZE = int(os.getenv("LOCATION_CACHE_SIZE", 8192))
+
+# Districts farmers commonly enter, with spellings and abbreviations seen in requests
+DEFAULT_GAZETTEER = {
+    "Rawalpindi": ["pindi", "rwp"],
+    "Islamabad": ["isb", "ict", "islamabad capital territory"],
+    "Lahore": ["lhr"],
+    "Karachi": ["khi"],
+    "Faisalabad": ["lyallpur", "fsd"],
+    "Multan": ["mux"],
+    "Peshawar": ["pesh"],
+    "Quetta": [],
+    "Hyderabad": ["hyderabad sindh"],
+    "Gujranwala": ["grw"],
+    "Sialkot": ["skt"],
+    "Bahawalpur": ["bwp"],
+    "Sargodha": [],
+    "Sukkur": [],
+    "Larkana": [],
+    "Sheikhupura": [],
+    "Sahiwal": [],
+    "Okara": [],
+    "Jhang": [],
+    "Kasur": [],
+    "Vehari": [],
+    "Khanewal": [],
+    "Chakwal": [],
+    "Attock": ["campbellpur"],
+    "Jhelum": [],
+    "Gujrat": [],
+    "Mandi Bahauddin": ["mandi bahaudin", "mb din"],
+    "Rahim Yar Khan": ["ryk", "rahimyar khan"],
+    "Dera Ghazi Khan": ["dg khan", "d g khan", "d.g. khan"],
+    "Dera Ismail Khan": ["di khan", "d i khan", "d.i. khan"],
+    "Mardan": [],
+    "Abbottabad": ["abbotabad"],
+    "Mirpur Khas": ["mirpurkhas"],
+    "Nawabshah": ["shaheed benazirabad", "benazirabad"],
+}
+DEFAULT_COUNTRY = "Pakistan"
+
+# Trailing address parts that do not change which forecast is meant
+REGION_NAMES = {
+    "pakistan",
+    "pk",
+    "punjab",
+    "sindh",
+    "khyber pakhtunkhwa",
+    "kpk",
+    "kp",
+    "balochistan",
+    "baluchistan",
+    "gilgit baltistan",
+    "azad kashmir",
+    "ajk",
+}
+FILLER_WORDS = {"district", "city", "tehsil", "division"}
+
+_COORDINATES = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+_NON_WORD = re.compile(r"[^\w\s]")
+_END = object()
+
+
+class CanonicalLocation:
+    """
+    A location resolved to a stable `key` shared by every spelling of it,
+    and the `query` sent upstream for it.
+    """
+
+    __slots__ = ("key", "query")
+
+    def __init__(self, key, query):
+        self.key = key
+        self.query = query
+
+    def __repr__(self):
+        return f"CanonicalLocation(key={self.key!r}, query={self.query!r})"
+
+
+def normalize_text(text):
+    """
+    Lowercase, strip accents and punctuation and collapse whitespace.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class Gazetteer:
+    """
+    Alias index with exact lookups through a dict and longest-prefix lookups
+    through a token trie, so "Dera Ghazi Khan District", "DG Khan, Punjab"
+    and "Dera Ghazi Khan, DG Khan" resolve like "Dera Ghazi Khan".
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._trie = {}
+        self._aliases = {}
+
+    def add(self, name, query, aliases=()):
+        canonical = CanonicalLocation(normalize_text(name), query)
+        names = self._aliases.setdefault(canonical.key, set())
+        for alias in (name, *aliases):
+            normalized = normalize_text(alias)
+            if not normalized:
+                continue
+            names.add(normalized)
+            self._exact[normalized] = canonical
+            node = self._trie
+            for token in normalized.split():
+                node = node.setdefault(token, {})
+            node[_END] = canonical
+
+    def lookup(self, normalized):
+        canonical = self._exact.get(normalized)
+        if canonical is not None:
+            return canonical
+
+        tokens = normalized.split()
+        node = self._trie
+        match, matched_tokens = None, 0
+        for index, token in enumerate(tokens):
+            node = node.get(token)
+            if node is None:
+                break
+            if _END in node:
+                match, matched_tokens = node[_END], index + 1
+        if match is None:
+            return None
+        # Only accept the prefix if the rest is address noise or another name
+        # of the same place ("Islamabad, ICT"), not a different place
+        if not _is_address_noise(tokens[matched_tokens:], self._aliases[match.key]):
+            return None
+        return match
+
+    def __len__(self):
+        return len(self._exact)
+
+
+def _is_address_noise(tokens, names=()):
+    """
+    Whether `tokens` consist only of region names, filler words and `names`,
+    e.g. "punjab pakistan" once commas are gone.
+    """
+    # Linear pass over phrase boundaries so client input cannot cause backtracking
+    longest = max([2, *(len(name.split()) for name in names)])
+    reachable = [True] + [False] * len(tokens)
+    for start in range(len(tokens)):
+        if not reachable[start]:
+            continue
+        for end in range(start + 1, min(len(tokens), start + longest) + 1):
+            phrase = " ".join(tokens[start:end])
+            if phrase in REGION_NAMES or phrase in FILLER_WORDS or phrase in names:
+                reachable[end] = True
+    return reachable[-1]
+
+
+def _is_region(text):
+    return _is_address_noise(text.split())
+
+
+def _load_gazetteer(path=LOCATION_GAZETTEER_PATH):
+    gazetteer = Gazetteer()
+    for name, aliases in DEFAULT_GAZETTEER.items():
+        gazetteer.add(name, f"{name}, {DEFAULT_COUNTRY}", aliases)
+    if path:
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+            for name, entry in entries.items():
+                gazetteer.add(name, entry.get("query", name), entry.get("aliases", []))
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Failed to load location gazetteer {path}: {str(e)}")
+    return gazetteer
+
+
+gazetteer = _load_gazetteer()
+
+
+def _format_degrees(value):
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def _snap(value):
+    grid = LOCATION_GRID_DEGREES
+    return round(round(value / grid) * grid, 6) if grid > 0 else value
+
+
+@functools.lru_cache(maxsize=LOCATION_CACHE_SIZE)
+def canonicalize(location):
+    """
+    Resolve free-text location input to a CanonicalLocation.
+
+    - "lat,lon" pairs are snapped to the LOCATION_GRID_DEGREES grid, and the
+      snapped point is queried so nearby farms share one forecast.
+    - Names and aliases in the gazetteer resolve to their canonical entry,
+      ignoring case, accents, punctuation and trailing district, province
+      or country parts.
+    - Anything else is keyed by its normalized text, without trailing
+      province or country parts, and queried as given.
+    """
+    location = str(location).strip()
+    coordinates = _COORDINATES.match(location)
+    if coordinates:
+        lat, lon = float(coordinates.group(1)), float(coordinates.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            point = f"{_format_degrees(_snap(lat))},{_format_degrees(_snap(lon))}"
+            return CanonicalLocation(f"@{point}", point)
+
+    parts = [normalize_text(part) for part in location.split(",")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return CanonicalLocation("", location)
+
+    canonical = gazetteer.lookup(" ".join(parts))
+    if canonical is None and len(parts) > 1 and all(_is_region(part) for part in parts[1:]):
+        canonical = gazetteer.lookup(parts[0])
+    if canonical is not None:
+        return canonical
+
+    while len(parts) > 1 and _is_region(parts[-1]):
+        parts.pop()
+    return CanonicalLocation(", ".join(parts), location)
+
+
+def location_key(location):
+    """
+    Stable key for caching and grouping work by location.
+    """
+    return canonicalize(location).key
@@ -1,25 +1,86 @@
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List, Dict, Optional, Any, Union
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List, Dict, Optional, Any
 import json
 from pydantic import BaseModel, Field, validator
 from dotenv import load_dotenv
+from groq import RateLimitError
 import logging
-from generate_tasks import generate_farm_tasks
-from weekly_advisory import generate_weekly_advisory
-
-logging.basicConfig(level=logging.INFO)
+from structured_logging import log_payload, setup_logging
+from generate_tasks import generate_farm_tasks_async, stream_farm_tasks
+from weekly_advisory import (
+    complete_advisory_async,
+    generate_weekly_advisory_async,
+    parse_advisory,
+    prepare_advisory_prompt,
+    render_advisory_prompt,
+    stream_weekly_advisory,
+)
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import our farm_analyzer module
-from farm_analyzer import generate_farm_report
-from weather_service import get_weather
+from farm_analyzer import generate_farm_report_async, stream_farm_report
+from weather_service import get_weather_async
+from forecast import ForecastDay, render_forecast
+from locations import location_key
+from llm_cache import cache_bypass
+from llm_scheduler import LLMQueueFull, priority_override
+from lifecycle import drain, readiness, warmup_async
+from metrics import MetricsMiddleware, render_metrics
+from tracing import TracingMiddleware, recent_traces
+from llm_client import extract_json
+from sse import sse_response
+from task_lists import PreviousTask, decode_task_list
+import fast_json
+from fast_json import APIResponse, accepts_msgpack, prefers_msgpack
+
+
+async def llm_cache_control(
+    cache_control: Optional[str] = Header(None),
+    x_cache_bypass: Optional[str] = Header(None),
+):
+    """
+    Skip cached LLM responses when the client sends `Cache-Control: no-cache`
+    or `X-Cache-Bypass: 1`.
+    """
+    bypass = bool(cache_control and "no-cache" in cache_control.lower()) or (
+        x_cache_bypass or ""
+    ).lower() in ("1", "true", "yes")
+    cache_bypass.set(bypass)
+
+
+async def negotiate_response(accept: Optional[str] = Header(None)):
+    """
+    Send MessagePack instead of JSON to clients that ask for it.
+    """
+    prefers_msgpack.set(accepts_msgpack(accept))
+
 
-app = FastAPI(title="Farm Analysis API", description="API for analyzing farm images")
+@asynccontextmanager
+async def lifespan(app):
+    await warmup_async()
+    yield
+    await drain()
+
+
+app = FastAPI(
+    title="Farm Analysis API",
+    description="API for analyzing farm images",
+    dependencies=[Depends(llm_cache_control), Depends(negotiate_response)],
+    default_response_class=APIResponse,
+    lifespan=lifespan,
+)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 class FarmParameters(BaseModel):
@@ -40,74 +101,129 @@ class FarmAnalysisRequest(BaseModel):
     parameters: FarmParameters = Field(..., description="Farm parameters")
 
 
-class PreviousTask(BaseModel):
-    taskId: str
-    title: str
-    priority: str
-    dueDate: str
-    status: str
-    context: Optional[str] = None
-    taskDescription: Optional[str] = None
-    steps: Optional[List[str]] = None
-    supportingInformation: Optional[str] = None
-    followUp: Optional[str] = None
-    dependencies: Optional[List[str]] = None
+class BatchFarmAnalysisRequest(BaseModel):
+    items: List[FarmAnalysisRequest] = Field(
+        ..., description="Farm analysis requests to process"
+    )
+    concurrency: Optional[int] = Field(
+        None, description="Maximum number of reports generated at once"
+    )
 
 
 class FarmTaskRequest(BaseModel):
     parameters: FarmParameters = Field(..., description="Farm parameters")
     farm_report: str = Field(..., description="Farm report text")
-    previous_tasks: Union[str, List[PreviousTask], None] = Field(
+    previous_tasks: Optional[List[PreviousTask]] = Field(
         None, description="Previous farm tasks as JSON string or object"
     )
 
-    @validator("previous_tasks")
+    @validator("previous_tasks", pre=True)
     def validate_previous_tasks(cls, value):
-        # Handling JSON string
-        if isinstance(value, str):
-            try:
-                # Try to parse the JSON string
-                parsed_data = json.loads(value)
-                # Ensure it's a list
-                if not isinstance(parsed_data, list):
-                    raise ValueError("JSON string must decode to a list")
-                return value  # Keep as string for processing
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON string for previous_tasks")
-        return value  
+        # JSON strings are decoded once here and validated into PreviousTask models
+        return decode_task_list(value)
+
+
+class FarmPipelineRequest(BaseModel):
+    image_urls: List[str] = Field(..., description="List of image URLs to analyze")
+    parameters: FarmParameters = Field(..., description="Farm parameters")
+    previous_tasks: Optional[List[PreviousTask]] = Field(
+        None, description="Previous farm tasks as JSON string or object"
+    )
+
+    @validator("previous_tasks", pre=True)
+    def validate_previous_tasks(cls, value):
+        return decode_task_list(value)
 
 
 class FarmAdvisoryRequest(BaseModel):
     parameters: FarmParameters = Field(..., description="Farm parameters")
     farm_report: str = Field(..., description="Farm report text")
-    upcoming_tasks: Union[str, List[PreviousTask], None] = Field(
+    upcoming_tasks: Optional[List[PreviousTask]] = Field(
         None, description="Upcoming farm tasks as JSON string or object"
     )
     weather_data: Optional[Any] = None
 
-    @validator("upcoming_tasks")
+    @validator("upcoming_tasks", pre=True)
     def validate_upcoming_tasks(cls, value):
-        # Handle JSON string
-        if isinstance(value, str):
-            try:
-                # Try to parse the JSON string
-                parsed_data = json.loads(value)
-                # Ensure it's a list
-                if not isinstance(parsed_data, list):
-                    raise ValueError("JSON string must decode to a list")
-                return value  # Keep as string for processing
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON string for upcoming_tasks")
-        return value  # Return as is if already a list or None
+        # JSON strings are decoded once here and validated into PreviousTask models
+        return decode_task_list(value)
+
+
+RATE_LIMIT_DETAIL = "Model rate limit reached, please retry shortly"
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))
+
+
+def rate_limit_exception(error):
+    """
+    429 for an upstream rate limit, or for a call the LLM scheduler shed,
+    with Retry-After when the scheduler gave a hint.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    headers = {"Retry-After": str(retry_after)} if retry_after else None
+    return HTTPException(status_code=429, detail=RATE_LIMIT_DETAIL, headers=headers)
+
+
+def current_weather_summary(weather_data):
+    """
+    One-line summary of the first forecast day, or None if unavailable.
+    """
+    if isinstance(weather_data, dict) and "error" not in weather_data:
+        weather_info = next(iter(weather_data.values()), None)
+        if isinstance(weather_info, ForecastDay):
+            weather_info = weather_info.as_dict()
+            return f"{weather_info['Condition']}, {weather_info['Max Temp']}, {weather_info['Humidity']} humidity"
+    return None
+
+
+def format_forecast(weather_data):
+    """
+    Multi-line text rendering of a forecast for the task prompt, or None if
+    the forecast is unavailable.
+    """
+    if not isinstance(weather_data, dict) or "error" in weather_data:
+        return None
+    weather_str = ""
+    for date, info in render_forecast(weather_data).items():
+        weather_str += f"\n  {date}\n"
+        for key, value in info.items():
+            weather_str += f"  {key}: {value}\n"
+    return weather_str
+
+
+def parse_report(report):
+    # Try to parse the report as JSON
+    try:
+        return extract_json(report)
+    except json.JSONDecodeError:
+        # If it's not valid JSON, return as text
+        return {"report": report}
+
+
+def parse_tasks(tasks_json, weather_data):
+    try:
+        tasks_data = (
+            extract_json(tasks_json) if isinstance(tasks_json, str) else tasks_json
+        )
+
+        response = {"tasks": tasks_data, "weather": weather_data}
+        return response
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error: {str(e)}")
+        return {"error": "Failed to parse tasks", "raw_response": tasks_json}
 
 
 @app.post("/generate-report")
-async def analyze_farm(request: FarmAnalysisRequest):
-    logger.info(f"Received request with {len(request.image_urls)} images")
-    logger.info(f"Parameters: {request.parameters.dict()}")
+async def analyze_farm(request: FarmAnalysisRequest, stream: bool = False):
     """
-    Analyze farm images from URLs and generate a report
+    Analyze farm images from URLs and generate a report.
+    With `stream=true` the report is sent as Server-Sent Events.
     """
+    log_payload(
+        logger,
+        "Received report request",
+        image_count=len(request.image_urls),
+        parameters=request.parameters,
+    )
     if not request.image_urls:
         raise HTTPException(status_code=400, detail="No image URLs provided")
 
@@ -118,44 +234,117 @@ async def analyze_farm(request: FarmAnalysisRequest):
         # If farmLocation is provided, get the current weather
         if params.get("farmLocation"):
             try:
-                weather_data = get_weather(params["farmLocation"], 1)
-                if isinstance(weather_data, dict) and "error" not in weather_data:
-                    first_date = next(iter(weather_data))
-                    weather_info = weather_data[first_date]
-                    params["currentWeather"] = (
-                        f"{weather_info['Condition']}, {weather_info['Max Temp']}, {weather_info['Humidity']} humidity"
-                    )
+                weather_data = await get_weather_async(params["farmLocation"], 1)
+                summary = current_weather_summary(weather_data)
+                if summary:
+                    params["currentWeather"] = summary
             except Exception as e:
                 logger.error(f"Failed to fetch weather: {str(e)}")
 
-        logger.info(f"Current weather: {params.get('currentWeather', 'Not available')}")
+        log_payload(
+            logger,
+            "Current weather",
+            current_weather=params.get("currentWeather", "Not available"),
+        )
+
+        if stream:
+            return sse_response(
+                stream_farm_report(request.image_urls, params), parse_report
+            )
 
         # Generate report using the URLs and updated parameters
-        report = generate_farm_report(request.image_urls, params)
+        report = await generate_farm_report_async(request.image_urls, params)
 
-        # Try to parse the report as JSON
-        try:
-            report_data = json.loads(report)
-            return report_data
-        except json.JSONDecodeError:
-            # If it's not valid JSON, return as text
-            return {"report": report}
+        return APIResponse(parse_report(report))
 
+    except (RateLimitError, LLMQueueFull) as e:
+        raise rate_limit_exception(e)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error processing request: {str(e)}"
         )
 
 
+async def _fetch_group_weather(location):
+    try:
+        return current_weather_summary(await get_weather_async(location, 1))
+    except Exception as e:
+        logger.error(f"Failed to fetch weather for {location}: {str(e)}")
+        return None
+
+
+@app.post("/batch-report")
+async def batch_analyze_farms(request: BatchFarmAnalysisRequest, stream: bool = False):
+    """
+    Generate reports for many farms in one request. Weather is fetched once
+    per farm location and report generation runs with bounded concurrency.
+    Each result carries the item's index and either its report or an error.
+    With `stream=true` results are sent as NDJSON lines as they complete.
+    """
+    logger.info(f"Received batch report request with {len(request.items)} items")
+
+    # Reports generated here queue behind interactive traffic
+    priority_override.set("batch")
+    concurrency = min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    groups = {}
+    for item in request.items:
+        location = item.parameters.farmLocation
+        if location:
+            groups.setdefault(location_key(location), location)
+    summaries = await asyncio.gather(
+        *(_fetch_group_weather(location) for location in groups.values())
+    )
+    weather_by_group = dict(zip(groups, summaries))
+
+    async def analyze_item(index, item):
+        if not item.image_urls:
+            return {"index": index, "error": "No image URLs provided"}
+        params = item.parameters.dict()
+        if item.parameters.farmLocation:
+            summary = weather_by_group.get(location_key(item.parameters.farmLocation))
+            if summary:
+                params["currentWeather"] = summary
+        try:
+            async with semaphore:
+                report = await generate_farm_report_async(item.image_urls, params)
+            return {"index": index, "result": parse_report(report)}
+        except (RateLimitError, LLMQueueFull):
+            return {"index": index, "error": RATE_LIMIT_DETAIL}
+        except Exception as e:
+            logger.error(f"Error in batch item {index}: {str(e)}")
+            return {"index": index, "error": f"Error processing request: {str(e)}"}
+
+    tasks = [
+        asyncio.create_task(analyze_item(index, item))
+        for index, item in enumerate(request.items)
+    ]
+
+    if stream:
+
+        async def ndjson_lines():
+            for completed in asyncio.as_completed(tasks):
+                yield fast_json.dumps_str(await completed) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    return APIResponse({"results": await asyncio.gather(*tasks)})
+
+
 @app.post("/create-tasks")
-async def create_tasks(request: FarmTaskRequest):
+async def create_tasks(request: FarmTaskRequest, stream: bool = False):
     """
     Generate tasks for farm based on farm report and parameters.
+    With `stream=true` the tasks are sent as Server-Sent Events.
     """
-    logger.info(f"Received task creation request")
-    logger.info(f"Parameters: {request.parameters.dict()}")
-    logger.info(f"Report: {request.farm_report}")
-    logger.info(f"Previous Tasks: {request.previous_tasks}")
+    log_payload(
+        logger,
+        "Received task creation request",
+        parameters=request.parameters,
+        farm_report=request.farm_report,
+        previous_tasks=request.previous_tasks,
+    )
 
     try:
         # Convert parameters to dictionary
@@ -165,53 +354,34 @@ async def create_tasks(request: FarmTaskRequest):
         # If farmLocation is provided, get the weather forecast for the next 7 days
         if params.get("farmLocation"):
             try:
-                weather_data = get_weather(
-                    params["farmLocation"], 10
-                )  
-                if isinstance(weather_data, dict) and "error" not in weather_data:
-                    # Format the weather data as a string
-                    weather_str = ""
-                    for date, info in weather_data.items():
-                        weather_str += f"\n  {date}\n"
-                        for key, value in info.items():
-                            weather_str += f"  {key}: {value}\n"
-
+                weather_data = await get_weather_async(params["farmLocation"], 10)
+                # Format the weather data as a string
+                weather_str = format_forecast(weather_data)
+                if weather_str:
                     params["currentWeather"] = weather_str
             except Exception as e:
                 logger.error(f"Failed to fetch weather forecast: {str(e)}")
 
-        # Handle previous_tasks - it can now be a JSON string or a list
-        previous_tasks = request.previous_tasks
-        if isinstance(previous_tasks, str):
-            try:
-                # If it's a JSON string, parse it
-                previous_tasks_list = json.loads(previous_tasks)
-                params["previousTasks"] = previous_tasks_list
-            except json.JSONDecodeError:
-                logger.error("Failed to parse previous_tasks JSON string")
-        elif previous_tasks:
-            # If it's already a list of objects
-            params["previousTasks"] = [
-                task.dict(exclude_none=True) for task in previous_tasks
-            ]
+        # Already validated into PreviousTask models, which the prompt serializes directly
+        if request.previous_tasks:
+            params["previousTasks"] = request.previous_tasks
+
+        if stream:
+            return sse_response(
+                stream_farm_tasks(parameters=params, farm_report=request.farm_report),
+                lambda tasks_json: parse_tasks(tasks_json, weather_data),
+            )
 
         # Generate tasks based on parameters and farm report
-        tasks_json = generate_farm_tasks(
+        tasks_json = await generate_farm_tasks_async(
             parameters=params, farm_report=request.farm_report
         )
 
         # Parse the JSON response
-        try:
-            tasks_data = (
-                json.loads(tasks_json) if isinstance(tasks_json, str) else tasks_json
-            )
-
-            response = {"tasks": tasks_data, "weather": weather_data}
-            return response
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            return {"error": "Failed to parse tasks", "raw_response": tasks_json}
+        return APIResponse(parse_tasks(tasks_json, weather_data))
 
+    except (RateLimitError, LLMQueueFull) as e:
+        raise rate_limit_exception(e)
     except Exception as e:
         logger.error(f"Error in create_tasks: {str(e)}")
         raise HTTPException(
@@ -219,37 +389,128 @@ async def create_tasks(request: FarmTaskRequest):
         )
 
 
+@app.post("/pipeline")
+async def run_pipeline(request: FarmPipelineRequest):
+    """
+    Run report, task and advisory generation server-side in one request.
+    The 10-day forecast is fetched once and shared by all stages, and the
+    advisory prompt is prepared while tasks are being generated.
+    """
+    logger.info(f"Received pipeline request with {len(request.image_urls)} images")
+    if not request.image_urls:
+        raise HTTPException(status_code=400, detail="No image URLs provided")
+
+    timings = {}
+    started = time.perf_counter()
+    stage_started = started
+
+    def finish_stage(name):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings[name] = round((now - stage_started) * 1000, 1)
+        stage_started = now
+
+    try:
+        params = request.parameters.dict(exclude_none=True)
+        weather_data = None
+        if params.get("farmLocation"):
+            try:
+                weather_data = await get_weather_async(params["farmLocation"], 10)
+            except Exception as e:
+                logger.error(f"Failed to fetch weather forecast: {str(e)}")
+        finish_stage("weather")
+
+        report_params = dict(params)
+        summary = current_weather_summary(weather_data)
+        if summary:
+            report_params["currentWeather"] = summary
+        report_data = parse_report(
+            await generate_farm_report_async(request.image_urls, report_params)
+        )
+        farm_report = report_data.get("report") or fast_json.dumps_str(report_data)
+        finish_stage("report")
+
+        task_params = dict(params)
+        weather_str = format_forecast(weather_data)
+        if weather_str:
+            task_params["currentWeather"] = weather_str
+        if request.previous_tasks:
+            task_params["previousTasks"] = request.previous_tasks
+        tasks_future = asyncio.create_task(
+            generate_farm_tasks_async(parameters=task_params, farm_report=farm_report)
+        )
+
+        # Only the upcoming tasks are missing once the tasks stage finishes
+        advisory_prompt = prepare_advisory_prompt(
+            parameters=params,
+            farm_report=farm_report,
+            weather_data=render_forecast(weather_data),
+        )
+        tasks = parse_tasks(await tasks_future, weather_data)
+        finish_stage("tasks")
+
+        upcoming_tasks = tasks.get("tasks")
+        if isinstance(upcoming_tasks, dict):
+            upcoming_tasks = upcoming_tasks.get("tasks", [])
+        advisory = await complete_advisory_async(
+            render_advisory_prompt(advisory_prompt, upcoming_tasks or [])
+        )
+        finish_stage("advisory")
+
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        return APIResponse(
+            {
+                "report": report_data,
+                "tasks": tasks.get("tasks", tasks),
+                "weather": weather_data,
+                "advisory": advisory,
+                "timings_ms": timings,
+            }
+        )
+
+    except (RateLimitError, LLMQueueFull) as e:
+        raise rate_limit_exception(e)
+    except Exception as e:
+        logger.error(f"Error in run_pipeline: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error processing request: {str(e)}"
+        )
+
+
 @app.post("/create-advisory")
-async def create_advisory(request: FarmAdvisoryRequest):
+async def create_advisory(request: FarmAdvisoryRequest, stream: bool = False):
     """
     Generate weekly advisory based on farm report, parameters, and upcoming tasks.
+    With `stream=true` the advisory is sent as Server-Sent Events.
     """
-    logger.info(f"Received Advisory creation request")
-    logger.info(f"Parameters: {request.parameters.dict()}")
-    logger.info(f"Report: {request.farm_report}")
-    logger.info(f"Upcoming Tasks: {request.upcoming_tasks}")
-    logger.info(f"Weather Data: {request.weather_data}")
+    log_payload(
+        logger,
+        "Received advisory creation request",
+        parameters=request.parameters,
+        farm_report=request.farm_report,
+        upcoming_tasks=request.upcoming_tasks,
+        weather_data=request.weather_data,
+    )
 
     try:
         # Convert parameters to dictionary
         params = request.parameters.dict(exclude_none=True)
 
-        # Handle upcoming_tasks - it can now be a JSON string or a list
-        upcoming_tasks = request.upcoming_tasks
-        if isinstance(upcoming_tasks, str):
-            try:
-                # If it's a JSON string, parse it
-                upcoming_tasks_list = json.loads(upcoming_tasks)
-                params["upcomingTasks"] = upcoming_tasks_list
-            except json.JSONDecodeError:
-                logger.error("Failed to parse upcoming_tasks JSON string")
-        elif upcoming_tasks:
-            # If it's already a list of objects
-            params["upcomingTasks"] = [
-                task.dict(exclude_none=True) for task in upcoming_tasks
-            ]
-
-        advisory_data_json = generate_weekly_advisory(
+        if request.upcoming_tasks:
+            params["upcomingTasks"] = request.upcoming_tasks
+
+        if stream:
+            return sse_response(
+                stream_weekly_advisory(
+                    parameters=params,
+                    farm_report=request.farm_report,
+                    farm_tasks_for_upcoming_week=params.get("upcomingTasks", []),
+                    weather_data=request.weather_data,
+                ),
+                parse_advisory,
+            )
+
+        advisory_data_json = await generate_weekly_advisory_async(
             parameters=params,
             farm_report=request.farm_report,
             farm_tasks_for_upcoming_week=params.get("upcomingTasks", []),
@@ -259,12 +520,12 @@ async def create_advisory(request: FarmAdvisoryRequest):
         # Parse the JSON response
         try:
             advisory_data = (
-                json.loads(advisory_data_json)
+                fast_json.loads(advisory_data_json)
                 if isinstance(advisory_data_json, str)
                 else advisory_data_json
             )
 
-            return advisory_data
+            return APIResponse(advisory_data)
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {str(e)}")
             return {
@@ -272,6 +533,8 @@ async def create_advisory(request: FarmAdvisoryRequest):
                 "raw_response": advisory_data_json,
             }
 
+    except (RateLimitError, LLMQueueFull) as e:
+        raise rate_limit_exception(e)
     except Exception as e:
         logger.error(f"Error in create_advisory: {str(e)}")
         raise HTTPException(
@@ -288,14 +551,45 @@ async def get_location_weather(location: str, days: int = 1):
         raise HTTPException(status_code=400, detail="Location parameter is required")
 
     try:
-        weather_data = get_weather(location, days)
+        weather_data = await get_weather_async(location, days)
         if "error" in weather_data:
             raise HTTPException(status_code=400, detail=weather_data["error"])
-        return weather_data
+        return APIResponse(weather_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching weather: {str(e)}")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics for this worker.
+    """
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """
+    Readiness probe: 200 once the worker is warmed up, 503 while starting,
+    after a failed warmup and while draining for shutdown.
+    """
+    is_ready, status = readiness()
+    return JSONResponse(status_code=200 if is_ready else 503, content=status)
+
+
+@app.get("/debug/traces", include_in_schema=False)
+async def debug_traces(
+    limit: int = 50, min_duration_ms: float = 0.0, path: Optional[str] = None
+):
+    """
+    Most recent sampled request traces, newest first.
+    """
+    return {
+        "traces": recent_traces(limit=limit, min_duration_ms=min_duration_ms, path=path)
+    }
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to AgriSense FastAPI"}
@@ -307,4 +601,5 @@ if __name__ == "__main__":
     # Get port and host from environment variables with defaults
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
+    # Development server; use server.py in production
     uvicorn.run("main:app", host=host, port=port, reload=True)
@@ -0,0 +1,259 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from tracing import record_span
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120,
+)
+
+REQUEST_LATENCY = Histogram(
+    "agrisense_request_duration_seconds",
+    "End-to-end request latency per endpoint",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "agrisense_requests_in_flight",
+    "Requests currently being handled per endpoint",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+STAGE_LATENCY = Histogram(
+    "agrisense_stage_duration_seconds",
+    "Latency of internal stages (get_weather, prompt_render, llm_call, json_parse, ...)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_RESPONSES = Counter(
+    "agrisense_upstream_responses_total",
+    "Upstream responses by service and HTTP status code",
+    ["upstream", "status"],
+)
+CACHE_EVENTS = Counter(
+    "agrisense_cache_events_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+COALESCED_CALLS = Counter(
+    "agrisense_coalesced_calls_total",
+    "Calls that joined an identical call already in flight instead of going upstream",
+    ["flight"],
+)
+LLM_TOKENS = Counter(
+    "agrisense_llm_tokens_total",
+    "Tokens reported by the model API",
+    ["model", "kind"],
+)
+PROMPT_TOKENS = Histogram(
+    "agrisense_prompt_tokens",
+    "Approximate size of rendered prompts in tokens (~4 characters each)",
+    ["template"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+# Labelled children are resolved once and reused on the hot path
+_stage_children = {}
+
+
+def _stage(stage):
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_LATENCY.labels(stage)
+    return child
+
+
+@contextmanager
+def observe_stage(stage):
+    """
+    Time the wrapped block into the stage latency histogram and as a span
+    of the current request's trace.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        _stage(stage).observe(duration)
+        record_span(stage, started, duration)
+
+
+def timed(stage):
+    """
+    Decorator timing every call of the function as `stage`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe_stage(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_upstream(upstream, status):
+    UPSTREAM_RESPONSES.labels(upstream, str(status)).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_coalesced(flight):
+    COALESCED_CALLS.labels(flight).inc()
+
+
+def record_prompt_size(template, tokens):
+    PROMPT_TOKENS.labels(template).observe(tokens)
+
+
+def record_tokens(model, usage):
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+
+
+class _RuntimeCollector:
+    """
+    Scheduler and connection pool gauges, read at scrape time so the hot
+    path pays nothing for them.
+    """
+
+    def describe(self):
+        # Without describe(), registering calls collect(), which imports
+        # llm_client while llm_client -> llm_cache -> metrics is still loading
+        return []
+
+    def collect(self):
+        from circuit_breaker import breaker_stats
+        from llm_client import client_stats
+        from llm_scheduler import scheduler
+
+        scheduler_stats = scheduler.stats()
+        queue_depth = GaugeMetricFamily(
+            "agrisense_llm_queue_depth",
+            "LLM calls waiting for the scheduler",
+            labels=["priority"],
+        )
+        for priority, waiting in scheduler_stats["waiting_by_priority"].items():
+            queue_depth.add_metric([priority], waiting)
+        yield queue_depth
+        yield GaugeMetricFamily(
+            "agrisense_llm_queue_avg_wait_seconds",
+            "Average time LLM calls waited for admission",
+            value=scheduler_stats["avg_wait_seconds"],
+        )
+        yield GaugeMetricFamily(
+            "agrisense_llm_rate_limited",
+            "Rate limit responses seen by the scheduler",
+            value=scheduler_stats["rate_limited"],
+        )
+        yield GaugeMetricFamily(
+            "agrisense_llm_shed",
+            "LLM calls rejected because the scheduler queue was full or too slow",
+            value=scheduler_stats["shed"],
+        )
+
+        pool_stats = client_stats()
+        pool = GaugeMetricFamily(
+            "agrisense_groq_pool",
+            "Groq client connection pool counters",
+            labels=["counter"],
+        )
+        for name, value in pool_stats.items():
+            pool.add_metric([name], value)
+        yield pool
+
+        breaker_open = GaugeMetricFamily(
+            "agrisense_circuit_open",
+            "Whether an upstream circuit breaker is refusing calls (1) or not (0)",
+            labels=["upstream"],
+        )
+        for name, stats in breaker_stats().items():
+            breaker_open.add_metric([name], 1 if stats["state"] == "open" else 0)
+        yield breaker_open
+
+
+_runtime_collector = _RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and in-flight requests per endpoint.
+    Paths that are not routes of the app are grouped under "other" to keep
+    label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._endpoints = None
+
+    def _endpoint(self, scope):
+        if self._endpoints is None:
+            self._endpoints = {
+                route.path for route in scope["app"].routes if hasattr(route, "path")
+            }
+        path = scope["path"]
+        return path if path in self._endpoints else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(endpoint, scope["method"], str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+
+def render_metrics():
+    """
+    Metrics of this process, or of every server worker when
+    PROMETHEUS_MULTIPROC_DIR is set. Scheduler and pool gauges always
+    describe the worker handling the scrape.
+
+    Returns:
+        tuple: Exposition payload and its content type
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_runtime_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
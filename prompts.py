@@ -0,0 +1,114 @@
+import logging
+import string
+import textwrap
+from fast_json import dumps_str
+from metrics import observe_stage, record_prompt_size
+
+logger = logging.getLogger(__name__)
+
+_formatter = string.Formatter()
+
+
+def compact_json(value):
+    """
+    Serialize a value for a prompt without indentation or extra separators.
+    """
+    return dumps_str(value)
+
+
+def approx_tokens(text):
+    """
+    Approximate token count at ~4 characters per token.
+    """
+    return (len(text) + 3) // 4
+
+
+class RenderedPrompt(str):
+    """
+    Prompt text that also reports its size.
+    """
+
+    @property
+    def chars(self):
+        return len(self)
+
+    @property
+    def approx_tokens(self):
+        return approx_tokens(self)
+
+
+class _Slot:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class PromptTemplate:
+    """
+    Prompt template split once into literal text and `{slot}` placeholders.
+    Static slots are bound at construction so only per-request values are
+    substituted on render. Literal braces are written as `{{` and `}}`.
+    """
+
+    def __init__(self, template, name="prompt", **static):
+        self.name = name
+        parts = []
+        for literal, field, spec, conversion in _formatter.parse(
+            textwrap.dedent(template).strip()
+        ):
+            if literal:
+                parts.append(literal)
+            if field is not None:
+                if spec or conversion or not field.isidentifier():
+                    raise ValueError(f"Unsupported placeholder in prompt: {field!r}")
+                parts.append(_Slot(field))
+        self._parts = self._bind(parts, static)
+
+    @staticmethod
+    def _bind(parts, values):
+        bound = []
+        for part in parts:
+            if isinstance(part, _Slot) and part.name in values:
+                part = str(values[part.name])
+            if isinstance(part, str) and bound and isinstance(bound[-1], str):
+                bound[-1] += part
+            else:
+                bound.append(part)
+        return bound
+
+    @property
+    def slots(self):
+        return [part.name for part in self._parts if isinstance(part, _Slot)]
+
+    def partial(self, **values):
+        """
+        Return a copy of the template with some slots filled in.
+        """
+        template = PromptTemplate.__new__(PromptTemplate)
+        template.name = self.name
+        template._parts = self._bind(self._parts, values)
+        return template
+
+    def render(self, **values):
+        """
+        Fill every remaining slot.
+
+        Raises:
+            KeyError: If a slot has no value
+        """
+        with observe_stage("prompt_render"):
+            prompt = RenderedPrompt(
+                "".join(
+                    part if isinstance(part, str) else str(values[part.name])
+                    for part in self._parts
+                )
+            )
+        record_prompt_size(self.name, prompt.approx_tokens)
+        logger.debug(
+            "Rendered %s prompt: %d chars, ~%d tokens",
+            self.name,
+            prompt.chars,
+            prompt.approx_tokens,
+        )
+        return prompt
@@ -0,0 +1,119 @@
+"""
+Production entry point: gunicorn managing uvicorn workers.
+
+    python server.py
+
+The app is imported once in the master and forked into the workers, which
+each warm up their clients and pools and then report ready on /ready.
+On SIGTERM workers report not ready on /ready for SHUTDOWN_NOT_READY_DELAY
+seconds, then stop accepting connections and drain in-flight calls.
+"""
+
+import asyncio
+import glob
+import os
+import signal
+import sys
+import tempfile
+
+# Must be set before prometheus_client is imported by the app
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="agrisense-metrics-")
+for stale in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(stale)
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from uvicorn import Server
+from uvicorn.workers import UvicornWorker
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+# Handlers are I/O bound and offload blocking calls to thread pools, so one
+# worker per core keeps every core busy
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Read by the app (imported after this) to split the Groq quotas between workers
+os.environ["SERVER_WORKERS"] = str(WEB_CONCURRENCY)
+# Longer than typical load balancer idle timeouts so they close first
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", 75))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+# Enough for an LLM call at GROQ_TIMEOUT to finish during shutdown
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 130))
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", 180))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 0))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 0))
+# Time between SIGTERM and closing the listener, for load balancers to see /ready fail
+SHUTDOWN_NOT_READY_DELAY = float(os.getenv("SHUTDOWN_NOT_READY_DELAY", 5))
+
+
+class DrainingServer(Server):
+    """
+    Uvicorn server that marks the worker as draining as soon as SIGTERM
+    arrives, and keeps serving for SHUTDOWN_NOT_READY_DELAY seconds before
+    shutting down. A second signal shuts down at once.
+    """
+
+    _exit_scheduled = False
+
+    def handle_exit(self, sig, frame):
+        from lifecycle import begin_drain
+
+        begin_drain()
+        if sig == signal.SIGTERM and SHUTDOWN_NOT_READY_DELAY > 0 and not self._exit_scheduled:
+            self._exit_scheduled = True
+            loop = asyncio.get_event_loop()
+            loop.call_later(SHUTDOWN_NOT_READY_DELAY, super().handle_exit, sig, frame)
+            return
+        super().handle_exit(sig, frame)
+
+
+class AgriSenseWorker(UvicornWorker):
+    async def _serve(self):
+        # UvicornWorker._serve, running DrainingServer
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def _child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+class AgriSenseServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+
+        return app
+
+
+def server_options():
+    return {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": AgriSenseWorker,
+        "preload_app": True,
+        "keepalive": SERVER_KEEPALIVE,
+        "backlog": SERVER_BACKLOG,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "timeout": SERVER_TIMEOUT,
+        "max_requests": SERVER_MAX_REQUESTS,
+        "max_requests_jitter": SERVER_MAX_REQUESTS_JITTER,
+        "child_exit": _child_exit,
+    }
+
+
+if __name__ == "__main__":
+    AgriSenseServer(server_options()).run()
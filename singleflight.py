@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from metrics import record_coalesced
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the
+    function and everyone who asks for the same key while it is in flight
+    receives its result or exception. Nothing is kept once the call ends, so
+    this bounds upstream load during bursts without acting as a cache.
+    With `enabled` unset every call runs on its own.
+    """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` on this thread, or wait for the call
+        already in flight for `key`.
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            record_coalesced(self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        Await `func(*args, **kwargs)`, or the call already in flight for `key`
+        on this event loop. Cancelling one caller does not cancel the shared
+        call for the others.
+        """
+        if not self.enabled:
+            return await func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        future = self._async_calls.get(key)
+        if future is not None and future.get_loop() is loop:
+            record_coalesced(self.name)
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func(*args, **kwargs))
+        self._async_calls[key] = future
+
+        def forget(finished):
+            if self._async_calls.get(key) is finished:
+                del self._async_calls[key]
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
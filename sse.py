@@ -0,0 +1,44 @@
+import logging
+from fastapi.responses import StreamingResponse
+from fast_json import dumps_str
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(data, event=None):
+    """
+    Format one Server-Sent Event with a JSON payload.
+    """
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {dumps_str(data)}\n\n"
+
+
+def completion_events(chunks, finalize):
+    """
+    Relay model output as `token` events, then a `result` event with the
+    parsed document. Failures mid-stream become an `error` event since the
+    status line has already been sent.
+
+    Args:
+        chunks: Iterator of content chunks from the model
+        finalize: Callable turning the joined content into the response dict
+    """
+    # Flush headers right away so clients see the first byte before the model does
+    yield ": stream open\n\n"
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event({"content": chunk}, event="token")
+        yield sse_event(finalize("".join(parts)), event="result")
+    except Exception as e:
+        logger.error(f"Error while streaming completion: {str(e)}")
+        yield sse_event({"detail": f"Error processing request: {str(e)}"}, event="error")
+
+
+def sse_response(chunks, finalize):
+    return StreamingResponse(
+        completion_events(chunks, finalize),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
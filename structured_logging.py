@@ -0,0 +1,149 @@
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from tracing import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for plain development output
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Payload fields longer than this are truncated and hashed
+LOG_FIELD_MAX_CHARS = int(os.getenv("LOG_FIELD_MAX_CHARS", 512))
+# Fraction of requests whose payloads are logged
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 1.0))
+
+_listener = None
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "trace_id"}
+
+
+def _jsonable(value):
+    if hasattr(value, "dict"):
+        return value.dict(exclude_none=True)
+    return str(value)
+
+
+def summarize(value, max_chars=None):
+    """
+    Make a payload field safe to log. Values that serialize to more than
+    `max_chars` characters are replaced by a preview, their size and a short
+    content hash, so identical payloads can still be matched across lines.
+    """
+    max_chars = LOG_FIELD_MAX_CHARS if max_chars is None else max_chars
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        text = value
+    else:
+        text = json.dumps(value, default=_jsonable, ensure_ascii=False, separators=(",", ":"))
+    if len(text) <= max_chars:
+        return value if isinstance(value, str) else json.loads(text)
+    return {
+        "preview": text[:max_chars],
+        "chars": len(text),
+        "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+    }
+
+
+def log_payload(logger, message, **fields):
+    """
+    Log request payload fields at INFO, summarized and subject to
+    LOG_PAYLOAD_SAMPLE_RATE. Nothing is serialized when the record would be
+    dropped anyway.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.info(
+        message, extra={key: summarize(value) for key, value in fields.items()}
+    )
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a record as a single JSON line, including any `extra` fields.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _RequestQueueHandler(QueueHandler):
+    """
+    Queue handler that does only cheap work on the calling thread: merge the
+    message arguments, render any traceback and tag the current trace.
+    Formatting and I/O happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = current_trace_id()
+        return record
+
+
+def _restart_listener():
+    global _listener
+    _listener = QueueListener(
+        _listener.queue, *_listener.handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def setup_logging(level=None, stream=None):
+    """
+    Route all logging through a queue to a background writer thread.
+    Safe to call more than once; later calls are ignored.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "text":
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(lambda: _listener.stop())
+    # The writer thread does not survive fork, so preloaded workers start their own
+    os.register_at_fork(after_in_child=_restart_listener)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_RequestQueueHandler(log_queue))
+    root.setLevel(level or LOG_LEVEL)
@@ -0,0 +1,50 @@
+from typing import List, Optional
+from pydantic import BaseModel, TypeAdapter
+from fast_json import JSONDecodeError, loads
+from prompts import compact_json
+
+
+class PreviousTask(BaseModel):
+    taskId: str
+    title: str
+    priority: str
+    dueDate: str
+    status: str
+    context: Optional[str] = None
+    taskDescription: Optional[str] = None
+    steps: Optional[List[str]] = None
+    supportingInformation: Optional[str] = None
+    followUp: Optional[str] = None
+    dependencies: Optional[List[str]] = None
+
+
+_task_list_adapter = TypeAdapter(List[PreviousTask])
+
+
+def decode_task_list(value):
+    """
+    Pre-validator for task list fields. Clients may send the list as a JSON
+    string; it is decoded here once and then validated like a JSON array.
+
+    Raises:
+        ValueError: If the string is not valid JSON or not a list
+    """
+    if isinstance(value, (str, bytes)):
+        try:
+            value = loads(value)
+        except JSONDecodeError:
+            raise ValueError("Invalid JSON string for task list")
+        if not isinstance(value, list):
+            raise ValueError("JSON string must decode to a list")
+    return value
+
+
+def tasks_prompt_json(tasks):
+    """
+    Compact JSON of a task list for a prompt. Validated tasks are serialized
+    straight from the models, skipping unset fields; plain dicts such as
+    freshly generated tasks are serialized as they are.
+    """
+    if tasks and all(isinstance(task, PreviousTask) for task in tasks):
+        return _task_list_adapter.dump_json(tasks, exclude_none=True).decode("utf-8")
+    return compact_json(tasks)
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("groq")
+
+import farm_analyzer
+from image_preprocessing import PreparedImage
+
+
+@pytest.fixture
+def grouped(monkeypatch):
+    monkeypatch.setattr(farm_analyzer, "REPORT_IMAGE_GROUP_SIZE", 1)
+
+
+def _images(*urls):
+    return [PreparedImage(url, url) for url in urls]
+
+
+def test_failed_group_is_left_out_of_the_merge(grouped, monkeypatch):
+    def analyze(report_prompt, images):
+        if images[0].url == "b":
+            raise RuntimeError("upstream failed")
+        return f'{{"report": "looked at {images[0].url}"}}'
+
+    monkeypatch.setattr(farm_analyzer, "_analyze_group", analyze)
+
+    messages = farm_analyzer._final_report_messages(
+        "prompt", _images("a", "b", "c"), {"crop": "wheat"}
+    )
+
+    merge_prompt = messages[0]["content"]
+    assert "Finding 1: looked at a" in merge_prompt
+    assert "Finding 3: looked at c" in merge_prompt
+    assert "Finding 2" not in merge_prompt
+
+
+def test_error_is_raised_when_every_group_fails(grouped, monkeypatch):
+    def analyze(report_prompt, images):
+        raise RuntimeError("upstream failed")
+
+    monkeypatch.setattr(farm_analyzer, "_analyze_group", analyze)
+
+    with pytest.raises(RuntimeError):
+        farm_analyzer._final_report_messages("prompt", _images("a", "b"), {})
+
+
+def test_report_cache_key_uses_content_hashes_not_payloads():
+    first = PreparedImage("https://example.com/a.jpg", "data:image/jpeg;base64,AAAA", "h1")
+    again = PreparedImage("https://example.com/a.jpg?v=2", "data:image/jpeg;base64,BBBB", "h1")
+    other = PreparedImage("https://example.com/a.jpg", "data:image/jpeg;base64,AAAA", "h2")
+
+    key = farm_analyzer._report_cache_key("prompt", [first])
+
+    assert farm_analyzer._report_cache_key("prompt", [again]) == key
+    assert farm_analyzer._report_cache_key("prompt", [other]) != key
+    assert farm_analyzer._report_cache_key("other prompt", [first]) != key
+
+
+def test_cached_report_skips_the_group_calls(grouped, monkeypatch):
+    import llm_client
+
+    class Cache:
+        def get(self, key):
+            return '{"report": "cached"}'
+
+    def analyze(report_prompt, images):
+        raise AssertionError("group analyzed despite a cached report")
+
+    monkeypatch.setattr(llm_client, "llm_cache", Cache())
+    monkeypatch.setattr(llm_client, "is_cacheable", lambda temperature: True)
+    monkeypatch.setattr(farm_analyzer, "prepare_images", lambda urls: _images(*urls))
+    monkeypatch.setattr(farm_analyzer, "_analyze_group", analyze)
+
+    report = farm_analyzer.generate_farm_report(["a", "b", "c"], {"crop": "wheat"})
+
+    assert report == '{"report": "cached"}'
@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+pytest.importorskip("requests")
+Image = pytest.importorskip("PIL.Image")
+
+import image_preprocessing
+
+
+def _payloads(urls):
+    return [image.payload for image in image_preprocessing.prepare_images(urls)]
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://example.com/field.jpg",
+        "file:///etc/passwd",
+        "https://127.0.0.1/field.jpg",
+        "https://10.0.0.5/field.jpg",
+        "https://169.254.169.254/latest/meta-data",
+        "https://[::ffff:192.168.1.1]/field.jpg",
+    ],
+)
+def test_internal_and_plain_http_urls_are_not_fetched(url):
+    with pytest.raises(image_preprocessing.ImageFetchRefused):
+        image_preprocessing._check_fetchable(url)
+
+
+def test_refused_url_is_passed_through_to_the_model():
+    url = "https://127.0.0.1/refused.jpg"
+    assert _payloads([url]) == [url]
+
+
+def test_decompression_bomb_falls_back_to_url(monkeypatch):
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 400)).save(buffer, format="PNG")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    monkeypatch.setattr(
+        image_preprocessing, "_download", lambda url: (buffer.getvalue(), "image/png")
+    )
+
+    url = "https://example.com/bomb.png"
+    assert _payloads([url]) == [url]
+
+
+def test_replay_mode_does_not_download(monkeypatch):
+    monkeypatch.setattr(image_preprocessing.traffic_replay, "TRAFFIC_MODE", "replay")
+
+    def download(url):
+        raise AssertionError("image downloaded during replay")
+
+    monkeypatch.setattr(image_preprocessing, "_download", download)
+
+    urls = ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+    assert _payloads(urls) == urls
+
+
+def test_failed_download_logs_the_host_only(monkeypatch, caplog):
+    def download(url):
+        raise image_preprocessing.requests.HTTPError(f"403 Client Error for url: {url}")
+
+    monkeypatch.setattr(image_preprocessing, "_download", download)
+
+    url = "https://bucket.example.com/field.jpg?X-Amz-Signature=secret"
+    assert _payloads([url]) == [url]
+    assert "bucket.example.com" in caplog.text
+    assert "secret" not in caplog.text
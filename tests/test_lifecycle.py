@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("groq")
+
+import executors
+import lifecycle
+import weather_prefetch
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setattr(weather_prefetch, "WEATHER_PREFETCH_ENABLED", False)
+
+
+def test_begin_drain_reports_not_ready():
+    lifecycle.warmup()
+    assert lifecycle.readiness()[0]
+
+    lifecycle.begin_drain()
+
+    is_ready, status = lifecycle.readiness()
+    assert not is_ready
+    assert status["state"] == "draining"
+
+
+def test_executors_survive_drain_for_a_second_lifespan():
+    async def lifespan():
+        await lifecycle.warmup_async()
+        assert lifecycle.readiness()[0]
+        assert await executors.run_llm(lambda: 42) == 42
+        await lifecycle.drain(timeout=5)
+        assert not lifecycle.readiness()[0]
+
+    asyncio.run(lifespan())
+    asyncio.run(lifespan())
+
+
+def test_wait_idle_times_out_while_work_is_running():
+    async def scenario():
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        blocker = asyncio.ensure_future(
+            executors.run_weather(
+                lambda: asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            )
+        )
+        await asyncio.sleep(0.05)
+        assert not await loop.run_in_executor(None, executors.wait_idle, 0.05)
+        release.set()
+        await blocker
+        assert await loop.run_in_executor(None, executors.wait_idle, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("groq")
+
+from llm_scheduler import LLMQueueFull, LLMScheduler
+
+
+def test_usage_is_reconciled_against_the_capped_reservation():
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=1000)
+    messages = [{"role": "user", "content": "x" * 20000}]
+
+    result = scheduler.run(lambda: ("ok", 6000), messages, "report")
+
+    assert result == "ok"
+    # The bucket only held 1000 tokens; the other 5000 used are owed
+    assert scheduler.tokens.tokens == pytest.approx(-5000, abs=1)
+
+
+def test_full_queue_sheds_calls_with_a_retry_hint():
+    scheduler = LLMScheduler(
+        requests_per_minute=60, tokens_per_minute=0, max_queue_depth=1
+    )
+    scheduler._queue.append((0, -1))
+
+    with pytest.raises(LLMQueueFull) as shed:
+        scheduler.acquire("report", 100)
+
+    assert shed.value.retry_after >= 1
+    assert scheduler.stats()["shed"] == 1
+
+
+def test_calls_queued_past_the_deadline_are_shed():
+    scheduler = LLMScheduler(
+        requests_per_minute=60, tokens_per_minute=0, max_queue_wait=0.05
+    )
+    scheduler.backoff(retry_after=30)
+
+    with pytest.raises(LLMQueueFull) as shed:
+        scheduler.acquire("report", 100)
+
+    assert shed.value.retry_after >= 29
+    assert scheduler.stats()["queue_depth"] == 0
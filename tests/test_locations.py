@@ -0,0 +1,34 @@
+import pytest
+
+from locations import canonicalize, location_key
+
+
+@pytest.mark.parametrize(
+    "spelling",
+    ["Rawalpindi", "rawalpindi ", "Rawalpindi, Punjab, Pakistan", "RWP", "Pindi"],
+)
+def test_spellings_share_a_key(spelling):
+    assert location_key(spelling) == "rawalpindi"
+
+
+@pytest.mark.parametrize("spelling", ["Islamabad, ICT", "ICT, Islamabad", "Islamabad ICT Pakistan"])
+def test_trailing_alias_of_the_same_place(spelling):
+    assert location_key(spelling) == "islamabad"
+
+
+def test_trailing_different_place_is_not_merged():
+    assert location_key("Islamabad, Rawalpindi") not in ("islamabad", "rawalpindi")
+
+
+@pytest.mark.parametrize("spelling", ["Hyderabad", "hyderabad sindh", "Hyderabad, Sindh"])
+def test_gazetteer_hits_query_the_pakistani_place(spelling):
+    # Sent upstream in place of the client text, pinning the Sindh city
+    assert canonicalize(spelling).query == "Hyderabad, Pakistan"
+
+
+def test_unknown_places_are_queried_as_given():
+    assert canonicalize("Chak 45 SB").query == "Chak 45 SB"
+
+
+def test_coordinates_snap_to_the_grid():
+    assert location_key("33.5973, 73.0479") == location_key("33.62,73.01")
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+pytest.importorskip("groq")
+
+import main
+from llm_scheduler import LLMQueueFull
+
+
+def _post(path, body):
+    async def request():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=body)
+
+    return asyncio.run(request())
+
+
+def test_shed_llm_call_is_a_429_with_retry_after(monkeypatch):
+    async def shed(**kwargs):
+        raise LLMQueueFull("LLM queue is full", 12)
+
+    monkeypatch.setattr(main, "generate_weekly_advisory_async", shed)
+
+    response = _post("/create-advisory", {"parameters": {}, "farm_report": "ok"})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "12"
+
+
+def test_task_list_strings_are_validated_as_tasks(monkeypatch):
+    async def advisory(**kwargs):
+        return {"upcoming": [task.taskId for task in kwargs["farm_tasks_for_upcoming_week"]]}
+
+    monkeypatch.setattr(main, "generate_weekly_advisory_async", advisory)
+    task = {
+        "taskId": "t1",
+        "title": "Irrigate",
+        "priority": "high",
+        "dueDate": "2025-04-28",
+        "status": "pending",
+    }
+
+    response = _post(
+        "/create-advisory",
+        {"parameters": {}, "farm_report": "ok", "upcoming_tasks": json.dumps([task])},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"upcoming": ["t1"]}
+
+    del task["dueDate"]
+    response = _post(
+        "/create-advisory",
+        {"parameters": {}, "farm_report": "ok", "upcoming_tasks": json.dumps([task])},
+    )
+    assert response.status_code == 422
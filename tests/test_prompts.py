@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from prometheus_client import REGISTRY
+
+from prompts import PromptTemplate
+
+
+def test_render_records_prompt_size_per_template():
+    template = PromptTemplate("Crop: {crop}", name="test_size")
+
+    prompt = template.render(crop="wheat" * 40)
+
+    labels = {"template": "test_size"}
+    assert REGISTRY.get_sample_value("agrisense_prompt_tokens_count", labels) == 1
+    assert REGISTRY.get_sample_value("agrisense_prompt_tokens_sum", labels) == prompt.approx_tokens
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+pytest.importorskip("groq")
+pytest.importorskip("prometheus_client")
+
+
+def _get(app, path):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    return asyncio.run(request())
+
+
+def test_main_imports_and_serves_metrics():
+    import main
+
+    response = _get(main.app, "/metrics")
+
+    assert response.status_code == 200
+    assert "agrisense_llm_queue_depth" in response.text
+    assert "agrisense_requests_in_flight" in response.text
+
+
+def test_root():
+    import main
+
+    response = _get(main.app, "/")
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "Welcome to AgriSense FastAPI"}
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("fcntl")
+
+import weather_prefetch
+from forecast_cache import forecast_cache
+from weather_prefetch import WeatherPrefetcher
+
+
+def _prefetcher(tmp_path):
+    prefetcher = WeatherPrefetcher(
+        hot_list_path=str(tmp_path / "hot.json"),
+        lock_path=str(tmp_path / "hot.json.lock"),
+        interval=3600,
+    )
+    prefetcher._refresh = lambda location: None
+    return prefetcher
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_only_one_prefetcher_leads(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather_prefetch, "WEATHER_PREFETCH_ELECTION_INTERVAL", 0.05)
+    first, second = _prefetcher(tmp_path), _prefetcher(tmp_path)
+    try:
+        first.start()
+        _wait_for(lambda: first.leader)
+        second.start()
+        assert second.warmed.wait(2)
+        assert not second.leader
+
+        first.stop()
+        _wait_for(lambda: second.leader)
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_popularity_tracks_a_bounded_number_of_locations():
+    popularity = weather_prefetch.LocationPopularity(max_entries=100)
+    for _ in range(5):
+        popularity.record("Rawalpindi")
+    for number in range(1000):
+        popularity.record(f"Village {number}")
+
+    assert len(popularity) <= 100
+    assert popularity.top(1)[0][0] == "Rawalpindi, Pakistan"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '["Lahore", {"location": "Multan", "score": 2}]',
+        '[{"a": 1}, {"location": "Multan", "score": "high"}, {"location": "Multan"}]',
+    ],
+)
+def test_malformed_hot_list_entries_are_skipped(tmp_path, content):
+    prefetcher = _prefetcher(tmp_path)
+    (tmp_path / "hot.json").write_text(content)
+
+    assert prefetcher.load_hot_list() == ["Multan"]
+
+
+def test_leader_warms_and_yields_the_lock_when_prefetching_fails(tmp_path):
+    prefetcher = _prefetcher(tmp_path)
+    (tmp_path / "hot.json").write_text('{"a": 1}')
+
+    def fail(location):
+        raise RuntimeError("refresh crashed")
+
+    prefetcher.popularity.record("Multan")
+    prefetcher._refresh = fail
+    try:
+        prefetcher.start()
+        assert prefetcher.warmed.wait(2)
+        _wait_for(lambda: not prefetcher.leader)
+    finally:
+        prefetcher.stop()
+
+
+def test_default_interval_refreshes_before_todays_forecast_expires():
+    assert weather_prefetch.WEATHER_PREFETCH_INTERVAL < forecast_cache.ttl_for(0)
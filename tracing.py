@@ -0,0 +1,170 @@
+import contextvars
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests whose traces are kept; slow requests are always kept
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 5000))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 200))
+# Optional collector receiving each kept trace as a JSON POST
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_buffer = deque(maxlen=TRACE_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_export_queue = queue.Queue(maxsize=1000)
+
+
+class Trace:
+    __slots__ = ("trace_id", "method", "path", "started_at", "_start", "spans", "status")
+
+    def __init__(self, method, path):
+        self.trace_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.status = None
+
+    def add_span(self, name, start, duration):
+        # list.append is atomic, so spans may be added from worker threads
+        self.spans.append((name, start - self._start, duration))
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def server_timing(self):
+        """
+        Server-Timing header value with span durations summed per name.
+        """
+        totals = {}
+        for name, _, duration in self.spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        entries = [
+            f'{name};dur={total * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (total, count) in totals.items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self, duration):
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(duration * 1000, 1),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round(start * 1000, 1),
+                    "duration_ms": round(span_duration * 1000, 1),
+                }
+                for name, start, span_duration in self.spans
+            ],
+        }
+
+
+def record_span(name, start, duration):
+    """
+    Attach a finished span to the current request's trace, if any.
+    `start` is a time.perf_counter() value.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration)
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def recent_traces(limit=50, min_duration_ms=0.0, path=None):
+    with _buffer_lock:
+        traces = list(_buffer)
+    traces = [
+        trace
+        for trace in reversed(traces)
+        if trace["duration_ms"] >= min_duration_ms
+        and (path is None or trace["path"] == path)
+    ]
+    return traces[:limit]
+
+
+def _keep(trace, duration):
+    record = trace.to_dict(duration)
+    with _buffer_lock:
+        _buffer.append(record)
+    if TRACE_EXPORT_URL:
+        try:
+            _export_queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def _export_worker():
+    session = requests.Session()
+    while True:
+        record = _export_queue.get()
+        try:
+            session.post(TRACE_EXPORT_URL, json=record, timeout=5)
+        except requests.RequestException as e:
+            logger.debug(f"Failed to export trace: {str(e)}")
+
+
+def _start_export_worker():
+    threading.Thread(target=_export_worker, name="trace-export", daemon=True).start()
+
+
+if TRACE_EXPORT_URL:
+    _start_export_worker()
+    # Threads do not survive fork, so preloaded server workers start their own
+    os.register_at_fork(after_in_child=_start_export_worker)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a trace per request. Span durations recorded
+    until the response starts are sent in a Server-Timing header; sampled
+    and slow traces are kept in an in-memory ring buffer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            duration = trace.elapsed()
+            if duration * 1000 >= TRACE_SLOW_MS or random.random() < TRACE_SAMPLE_RATE:
+                _keep(trace, duration)
@@ -0,0 +1,317 @@
+import atexit
+import copy
+import glob
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import httpx
+from groq import APIStatusError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# "record" captures Groq and weatherapi traffic to the corpus, "replay" serves
+# it back instead of calling the network; anything else leaves traffic alone.
+# Report images are not downloaded on replay (see image_preprocessing).
+TRAFFIC_MODE = os.getenv("TRAFFIC_MODE", "").lower()
+TRAFFIC_CORPUS = os.getenv("TRAFFIC_CORPUS", "traffic_corpus")
+# Multiplier for recorded latencies on replay; 0 replays without delays
+TRAFFIC_REPLAY_SPEED = float(os.getenv("TRAFFIC_REPLAY_SPEED", 1.0))
+
+# Request parameters that are never written to the corpus
+SECRET_PARAMS = {"key", "api_key", "apikey", "access_token", "authorization"}
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+class ReplayMiss(LookupError):
+    """
+    Raised in replay mode when the corpus holds nothing matching a request.
+    """
+
+
+def _hash(value):
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _scrub(params):
+    return {k: v for k, v in params.items() if k.lower() not in SECRET_PARAMS}
+
+
+def _groq_kinds(kwargs):
+    # Looser matches used when the exact request was never recorded
+    stream = bool(kwargs.get("stream"))
+    return [
+        ["groq", kwargs.get("model"), stream, kwargs.get("temperature")],
+        ["groq", stream],
+    ]
+
+
+def _weather_kinds(params):
+    call = "day" if params.get("dt") else "range"
+    location = " ".join(str(params.get("q", "")).lower().split())
+    return [["weatherapi", call, location], ["weatherapi", call]]
+
+
+class _Corpus:
+    """
+    Gzipped JSON lines, one file per service and process. Each entry holds
+    the request hash, looser match keys, a scrubbed request summary, the
+    response and its timing.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = {}
+        self._lock = threading.Lock()
+        self._index = None
+        self._cursors = {}
+
+    def write(self, service, entry):
+        with self._lock:
+            handle = self._files.get(service)
+            if handle is None:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{service}-{os.getpid()}.jsonl.gz")
+                handle = gzip.open(path, "at", encoding="utf-8")
+                self._files[service] = handle
+            handle.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False))
+            handle.write("\n")
+            handle.flush()
+
+    def close(self):
+        with self._lock:
+            for handle in self._files.values():
+                handle.close()
+            self._files.clear()
+
+    def _load(self):
+        index = {}
+        count = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl.gz"))):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    count += 1
+                    for lookup in [entry["key"]] + [_hash(k) for k in entry["kinds"]]:
+                        index.setdefault(lookup, []).append(entry)
+        logger.info(f"Loaded {count} recorded calls from {self.directory}")
+        return index
+
+    def find(self, key, kinds):
+        """
+        Return a recorded entry for the exact request, else one of the same
+        kind. Repeated lookups rotate through the matches so a replay keeps
+        the recorded spread of latencies.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._load()
+            for lookup in [key] + [_hash(k) for k in kinds]:
+                entries = self._index.get(lookup)
+                if entries:
+                    cursor = self._cursors.setdefault(lookup, itertools.count())
+                    return entries[next(cursor) % len(entries)]
+        raise ReplayMiss(f"No recorded call matches {kinds[0]}")
+
+
+_corpus = _Corpus(TRAFFIC_CORPUS)
+atexit.register(lambda: _corpus.close())
+
+
+def configure(mode, corpus=None):
+    """
+    Switch the traffic mode at runtime, e.g. from a load-test driver that
+    imports the app before choosing a corpus.
+    """
+    global TRAFFIC_MODE, _corpus
+    TRAFFIC_MODE = mode.lower()
+    if corpus is not None and corpus != _corpus.directory:
+        _corpus.close()
+        _corpus = _Corpus(corpus)
+
+
+def _sleep(seconds):
+    if seconds and TRAFFIC_REPLAY_SPEED > 0:
+        time.sleep(seconds * TRAFFIC_REPLAY_SPEED)
+
+
+def _groq_request(kwargs):
+    summary = {k: v for k, v in kwargs.items() if k != "messages"}
+    summary["prompt_chars"] = len(json.dumps(kwargs.get("messages"), default=str))
+    return summary
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+def _record_stream(stream, entry, started):
+    chunks = []
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            chunks.append([round(time.perf_counter() - started, 4), delta])
+            yield chunk
+    finally:
+        entry["response"] = {"chunks": chunks}
+        _corpus.write("groq", entry)
+
+
+def _record_groq(send, kwargs):
+    entry = {
+        "key": _hash(kwargs),
+        "kinds": _groq_kinds(kwargs),
+        "request": _groq_request(kwargs),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    started = time.perf_counter()
+    try:
+        response = send(**kwargs)
+    except APIStatusError as e:
+        entry["elapsed"] = round(time.perf_counter() - started, 4)
+        entry["error"] = {
+            "status": e.status_code,
+            "message": str(e),
+            "retry_after": e.response.headers.get("retry-after"),
+        }
+        _corpus.write("groq", entry)
+        raise
+    entry["elapsed"] = round(time.perf_counter() - started, 4)
+
+    if kwargs.get("stream"):
+        return _record_stream(response, entry, time.perf_counter())
+    entry["response"] = {
+        "content": response.choices[0].message.content,
+        "usage": _usage_dict(getattr(response, "usage", None)),
+    }
+    _corpus.write("groq", entry)
+    return response
+
+
+def _replay_stream(chunks):
+    previous = 0.0
+    for offset, delta in chunks:
+        _sleep(offset - previous)
+        previous = offset
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+
+def _replay_groq(kwargs):
+    entry = _corpus.find(_hash(kwargs), _groq_kinds(kwargs))
+    _sleep(entry["elapsed"])
+
+    error = entry.get("error")
+    if error:
+        headers = {"retry-after": error["retry_after"]} if error.get("retry_after") else {}
+        response = httpx.Response(
+            error["status"], headers=headers, request=httpx.Request("POST", GROQ_URL)
+        )
+        error_class = RateLimitError if error["status"] == 429 else APIStatusError
+        raise error_class(error["message"], response=response, body=None)
+
+    recorded = entry["response"]
+    if "chunks" in recorded:
+        return _replay_stream(recorded["chunks"])
+    usage = recorded.get("usage")
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=recorded["content"]))],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+
+def groq_create(send, **kwargs):
+    """
+    Issue a chat completion through `send`, recording or replaying it
+    according to TRAFFIC_MODE.
+
+    Args:
+        send: Callable performing the real completion request
+        **kwargs: Completion arguments
+
+    Returns:
+        The completion response, or a stream of chunks when `stream` is set
+    """
+    if TRAFFIC_MODE == "replay":
+        return _replay_groq(kwargs)
+    if TRAFFIC_MODE == "record":
+        return _record_groq(send, kwargs)
+    return send(**kwargs)
+
+
+class _ReplayResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        if self._payload is None:
+            raise ValueError("Recorded response had no JSON body")
+        return self._payload
+
+
+def _align_dates(payload, params):
+    """
+    Move recorded forecast dates onto the requested ones so a corpus keeps
+    working on later days.
+    """
+    forecast_days = (payload or {}).get("forecast", {}).get("forecastday", [])
+    if params.get("dt"):
+        for day in forecast_days[:1]:
+            day["date"] = params["dt"]
+        return
+    today = datetime.now()
+    for i, day in enumerate(forecast_days):
+        day["date"] = (today + timedelta(days=i)).strftime("%Y-%m-%d")
+
+
+def weather_get(session, url, params, timeout=None):
+    """
+    GET a weatherapi URL on `session`, recording or replaying the call
+    according to TRAFFIC_MODE. API keys are never written to the corpus.
+    """
+    scrubbed = _scrub(params)
+    if TRAFFIC_MODE == "replay":
+        entry = _corpus.find(_hash(scrubbed), _weather_kinds(scrubbed))
+        _sleep(entry["elapsed"])
+        payload = copy.deepcopy(entry["response"]["body"])
+        _align_dates(payload, scrubbed)
+        return _ReplayResponse(entry["response"]["status"], payload)
+
+    if TRAFFIC_MODE != "record":
+        return session.get(url, params=params, timeout=timeout)
+
+    started = time.perf_counter()
+    response = session.get(url, params=params, timeout=timeout)
+    elapsed = time.perf_counter() - started
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    _corpus.write(
+        "weatherapi",
+        {
+            "key": _hash(scrubbed),
+            "kinds": _weather_kinds(scrubbed),
+            "request": scrubbed,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(elapsed, 4),
+            "response": {"status": response.status_code, "body": body},
+        },
+    )
+    return response
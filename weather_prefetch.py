@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where every process prefetches
+    fcntl = None
+from forecast_cache import forecast_cache
+from locations import canonicalize
+from llm_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+WEATHER_PREFETCH_DAYS = int(os.getenv("WEATHER_PREFETCH_DAYS", 10))
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", 50))
+# Every hot location is refreshed once per cycle, spread evenly across it. By
+# default a cycle ends a little before today's forecast expires from the cache
+WEATHER_PREFETCH_INTERVAL = float(
+    os.getenv("WEATHER_PREFETCH_INTERVAL", 0.9 * forecast_cache.ttl_for(0))
+)
+# Upstream calls per minute the prefetcher may spend
+WEATHER_PREFETCH_CALLS_PER_MINUTE = float(
+    os.getenv("WEATHER_PREFETCH_CALLS_PER_MINUTE", 60)
+)
+# Request counts halve over this many seconds so the hot list follows demand
+WEATHER_PREFETCH_HALF_LIFE = float(os.getenv("WEATHER_PREFETCH_HALF_LIFE", 6 * 60 * 60))
+# Locations tracked at most; past this, decayed-out and then least requested ones are dropped
+WEATHER_PREFETCH_MAX_TRACKED = int(os.getenv("WEATHER_PREFETCH_MAX_TRACKED", 10000))
+# Decayed scores below this no longer count as demand
+WEATHER_PREFETCH_MIN_SCORE = float(os.getenv("WEATHER_PREFETCH_MIN_SCORE", 0.05))
+WEATHER_HOT_LIST_PATH = os.getenv("WEATHER_HOT_LIST_PATH", "weather_hot_locations.json")
+# How long startup waits for the hot list to be warmed before reporting ready
+WEATHER_PREFETCH_WARMUP_TIMEOUT = float(os.getenv("WEATHER_PREFETCH_WARMUP_TIMEOUT", 30))
+# Only the server worker holding this lock prefetches; the others retry periodically
+WEATHER_PREFETCH_LOCK_PATH = os.getenv(
+    "WEATHER_PREFETCH_LOCK_PATH", f"{WEATHER_HOT_LIST_PATH}.lock" if WEATHER_HOT_LIST_PATH else ""
+)
+WEATHER_PREFETCH_ELECTION_INTERVAL = float(os.getenv("WEATHER_PREFETCH_ELECTION_INTERVAL", 60))
+
+
+class LocationPopularity:
+    """
+    Request counts per canonical location with exponential decay. Locations
+    come from clients, so at most `max_entries` are tracked.
+    """
+
+    def __init__(
+        self,
+        half_life=WEATHER_PREFETCH_HALF_LIFE,
+        max_entries=WEATHER_PREFETCH_MAX_TRACKED,
+        min_score=WEATHER_PREFETCH_MIN_SCORE,
+    ):
+        self.half_life = half_life
+        self.max_entries = max_entries
+        self.min_score = min_score
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated, now):
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, location, weight=1.0):
+        canonical = canonicalize(location)
+        if not canonical.key:
+            return
+        now = time.time()
+        with self._lock:
+            score, updated, _ = self._scores.get(canonical.key, (0.0, now, None))
+            self._scores[canonical.key] = (
+                self._decayed(score, updated, now) + weight,
+                now,
+                canonical.query,
+            )
+            if len(self._scores) > self.max_entries:
+                self._prune(now)
+
+    def _prune(self, now):
+        """
+        Drop locations whose decayed score fell below `min_score`, then the
+        least requested ones until a tenth of the capacity is free again.
+        """
+        scored = sorted(
+            (self._decayed(score, updated, now), key)
+            for key, (score, updated, _) in self._scores.items()
+        )
+        keep = int(self.max_entries * 0.9)
+        for index, (score, key) in enumerate(scored):
+            if score >= self.min_score and len(scored) - index <= keep:
+                break
+            del self._scores[key]
+
+    def __len__(self):
+        return len(self._scores)
+
+    def top(self, n):
+        """
+        Returns:
+            list: Up to `n` (location, score) pairs, most requested first
+        """
+        now = time.time()
+        with self._lock:
+            scored = [
+                (location, self._decayed(score, updated, now))
+                for score, updated, location in self._scores.values()
+            ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+
+def _refresh_cost(days):
+    # One ranged call plus one call per day past the ranged window
+    from weather_service import WEATHER_RANGE_DAYS
+
+    return 1 + max(0, days - max(1, WEATHER_RANGE_DAYS))
+
+
+class WeatherPrefetcher:
+    """
+    Background thread keeping the forecasts of the most requested locations
+    in the cache, so requests rarely wait on the upstream. Each cycle
+    refreshes the current top locations, spread across the cycle and paced
+    to the upstream call budget, and persists the hot list so a restarted
+    worker can warm its cache before taking traffic.
+
+    Under the multi-worker server only the worker holding the prefetch lock
+    runs, so the call budget is spent once and a single process writes the
+    hot list. Its counts are a sample of the traffic, which the server
+    spreads evenly across workers.
+    """
+
+    def __init__(
+        self,
+        popularity=None,
+        days=WEATHER_PREFETCH_DAYS,
+        top_n=WEATHER_PREFETCH_TOP_N,
+        interval=WEATHER_PREFETCH_INTERVAL,
+        calls_per_minute=WEATHER_PREFETCH_CALLS_PER_MINUTE,
+        hot_list_path=WEATHER_HOT_LIST_PATH,
+        lock_path=WEATHER_PREFETCH_LOCK_PATH,
+    ):
+        self.popularity = popularity or LocationPopularity()
+        self.days = days
+        self.top_n = top_n
+        self.interval = interval
+        self.hot_list_path = hot_list_path
+        self.lock_path = lock_path
+        self.refreshed = 0
+        self.failed = 0
+        self.warmed = threading.Event()
+        self._budget = TokenBucket(calls_per_minute)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def load_hot_list(self):
+        """
+        Seed the popularity counts from the persisted hot list.
+
+        Returns:
+            list: Locations from the file, most requested first
+        """
+        if not self.hot_list_path or not os.path.exists(self.hot_list_path):
+            return []
+        try:
+            with open(self.hot_list_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load weather hot list: {str(e)}")
+            return []
+        if not isinstance(entries, list):
+            logger.error("Failed to load weather hot list: expected a list of entries")
+            return []
+
+        locations = []
+        for entry in entries:
+            # The file may have been edited by hand; skip what cannot be used
+            location = entry.get("location") if isinstance(entry, dict) else None
+            score = entry.get("score", 1.0) if isinstance(entry, dict) else None
+            if not (location and isinstance(location, str) and isinstance(score, (int, float))):
+                continue
+            self.popularity.record(location, score)
+            locations.append(location)
+        if len(locations) < len(entries):
+            logger.error(f"Skipped {len(entries) - len(locations)} malformed weather hot list entries")
+        return locations
+
+    def save_hot_list(self, hot):
+        if not self.hot_list_path:
+            return
+        tmp_path = f"{self.hot_list_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    [{"location": location, "score": round(score, 3)} for location, score in hot],
+                    f,
+                )
+            os.replace(tmp_path, self.hot_list_path)
+        except OSError as e:
+            logger.error(f"Failed to save weather hot list: {str(e)}")
+
+    def _refresh(self, location):
+        from weather_service import refresh_weather
+
+        cost = _refresh_cost(self.days)
+        delay = self._budget.wait_time(cost, time.monotonic())
+        if delay and self._stop.wait(delay):
+            return
+        self._budget.consume(cost)
+        try:
+            forecast = refresh_weather(location, self.days)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Prefetch for {location} failed: {str(e)}")
+            return
+        if any(isinstance(day, dict) for day in forecast.values()):
+            self.failed += 1
+        else:
+            self.refreshed += 1
+
+    def _try_lead(self):
+        """
+        Take the prefetch lock so a single server worker prefetches and
+        writes the hot list. Held until `stop` or the process exits.
+        """
+        if self._lock_file is not None:
+            return True
+        if fcntl is None or not self.lock_path:
+            self._lock_file = False
+            return True
+        try:
+            lock_file = open(self.lock_path, "a")
+        except OSError as e:
+            logger.error(f"Failed to open weather prefetch lock: {str(e)}")
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release(self):
+        if self._lock_file:
+            self._lock_file.close()
+        self._lock_file = None
+
+    @property
+    def leader(self):
+        return self._lock_file is not None
+
+    def _run(self):
+        # Workers that do not prefetch have nothing to warm
+        if not self._try_lead():
+            self.warmed.set()
+            while not self._try_lead():
+                if self._stop.wait(WEATHER_PREFETCH_ELECTION_INTERVAL):
+                    return
+        logger.info(f"Weather prefetch running in process {os.getpid()}")
+        try:
+            self._prefetch()
+        except Exception as e:
+            # Let another worker take over rather than hold the lock idle
+            logger.error(f"Weather prefetch stopped: {str(e)}")
+            self._release()
+        finally:
+            self.warmed.set()
+
+    def _prefetch(self):
+        for location in self.load_hot_list()[: self.top_n]:
+            if self._stop.is_set():
+                return
+            self._refresh(location)
+        self.warmed.set()
+
+        while not self._stop.is_set():
+            cycle_started = time.monotonic()
+            hot = self.popularity.top(self.top_n)
+            self.save_hot_list(hot)
+            spacing = self.interval / max(1, len(hot))
+            for index, (location, _) in enumerate(hot):
+                if self._stop.wait(max(0.0, cycle_started + index * spacing - time.monotonic())):
+                    return
+                self._refresh(location)
+            self._stop.wait(max(0.0, cycle_started + self.interval - time.monotonic()))
+
+    def start(self):
+        """
+        Start the background thread. The worker that wins the prefetch lock
+        refreshes the persisted hot list first, as fast as the call budget
+        allows, and then keeps the hot locations fresh. `warmed` is set once
+        that is done, or at once in workers that do not prefetch.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="weather-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            if self.leader:
+                self.save_hot_list(self.popularity.top(self.top_n))
+            self._release()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "leader": self.leader,
+            "warmed": self.warmed.is_set(),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "hot_locations": len(self.popularity.top(self.top_n)),
+        }
+
+
+prefetcher = WeatherPrefetcher()
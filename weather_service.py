@@ -1,74 +1,296 @@
+import logging
 import os
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from circuit_breaker import CircuitBreaker
+from executors import run_weather
+from forecast import ForecastDay
+from forecast_cache import forecast_cache
+from locations import canonicalize, location_key
+from metrics import record_upstream, timed
+from requests.adapters import HTTPAdapter
+from singleflight import SingleFlight
+from traffic_replay import weather_get
+from weather_prefetch import prefetcher
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
+WEATHER_API_URL = "https://api.weatherapi.com/v1/forecast.json"
+
+# Days the upstream plan returns from a single ranged forecast call
+WEATHER_RANGE_DAYS = int(os.getenv("WEATHER_RANGE_DAYS", 3))
+# Upper bound on concurrent weatherapi calls per process: the size of the
+# fetch pool and of the session's connection pool
+WEATHER_MAX_PARALLEL = int(os.getenv("WEATHER_MAX_PARALLEL", 8))
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3))
+WEATHER_READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT", 5))
+# Consecutive failed upstream calls before the breaker opens, and how long it stays open
+WEATHER_BREAKER_THRESHOLD = int(os.getenv("WEATHER_BREAKER_THRESHOLD", 5))
+WEATHER_BREAKER_RESET = float(os.getenv("WEATHER_BREAKER_RESET", 30))
+# Expired days younger than this are served at once while a background refresh runs
+FORECAST_STALE_REVALIDATE = float(os.getenv("FORECAST_STALE_REVALIDATE", 60 * 60))
+
+UNAVAILABLE_ERROR = "Weather service temporarily unavailable"
+
+_session = None
+_session_lock = threading.Lock()
+# Individual upstream calls. Callers of get_weather run on
+# executors.weather_executor and block on these futures, so the two pools
+# must stay separate.
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=WEATHER_MAX_PARALLEL, thread_name_prefix="weather-fetch"
+)
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+weather_flight = SingleFlight("weather")
+
+weather_breaker = CircuitBreaker(
+    "weatherapi",
+    failure_threshold=WEATHER_BREAKER_THRESHOLD,
+    reset_timeout=WEATHER_BREAKER_RESET,
+)
+
+
+def _get_session():
+    """
+    Return the process-wide keep-alive session used for weatherapi calls.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount(
+                    "https://",
+                    HTTPAdapter(pool_connections=1, pool_maxsize=WEATHER_MAX_PARALLEL),
+                )
+                _session = session
+    return _session
+
+
+def _upstream_get(params):
+    """
+    Call weatherapi with timeouts, through the circuit breaker.
+
+    Returns:
+        Response, or None if the call was refused or failed to complete
+    """
+    if not weather_breaker.allow():
+        return None
+    try:
+        response = weather_get(
+            _get_session(),
+            WEATHER_API_URL,
+            params,
+            timeout=(WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT),
+        )
+    except requests.RequestException as e:
+        weather_breaker.record_failure()
+        record_upstream("weatherapi", "timeout" if isinstance(e, requests.Timeout) else "error")
+        logger.error(f"Weather request failed: {str(e)}")
+        return None
+
+    record_upstream("weatherapi", response.status_code)
+    # Client errors such as an unknown location say nothing about upstream health
+    if response.status_code >= 500 or response.status_code == 429:
+        weather_breaker.record_failure()
+    else:
+        weather_breaker.record_success()
+    return response
+
+
+def _fetch_range(location, days, api_key):
+    """
+    Fetch the first `days` days in a single upstream call.
+
+    Returns:
+        dict: ForecastDay keyed by date; empty if the call failed
+    """
+    response = _upstream_get({"q": location, "days": days, "key": api_key})
+    if response is None or response.status_code != 200:
+        return {}
+
+    forecast_days = response.json().get("forecast", {}).get("forecastday", [])
+    return {day["date"]: ForecastDay.from_api(day["day"]) for day in forecast_days}
+
+
+def _fetch_day(location, formatted_date, api_key):
+    """
+    Fetch a single forecast day using the `dt` parameter.
+    """
+    response = _upstream_get(
+        {"q": location, "days": 1, "dt": formatted_date, "key": api_key}
+    )
+    if response is None:
+        return {"error": UNAVAILABLE_ERROR}
+    if response.status_code != 200:
+        return {
+            "error": f"API request failed with status code {response.status_code}"
+        }
+
+    data = response.json()
+
+    if (
+        "forecast" in data
+        and "forecastday" in data["forecast"]
+        and len(data["forecast"]["forecastday"]) > 0
+    ):
+        return ForecastDay.from_api(data["forecast"]["forecastday"][0]["day"])
+
+    return {"error": "No forecast data available for this date"}
+
+
+def _fetch_missing(location, dates, missing, api_key):
+    """
+    Fetch the days at indices `missing` of `dates`. Those inside the first
+    WEATHER_RANGE_DAYS come from one ranged call and the others are fetched
+    per day, concurrently, over a shared session. Good days are cached.
+
+    Returns:
+        dict: ForecastDay or error entry for each missing date
+    """
+    # One ranged call covers every missing day inside the upstream's range window
+    range_days = min(max(missing) + 1, max(1, WEATHER_RANGE_DAYS))
+    range_future = None
+    if missing[0] < range_days:
+        range_future = _fetch_executor.submit(_fetch_range, location, range_days, api_key)
+
+    # Days past the ranged window are needed regardless, so start them now
+    day_futures = {
+        dates[i]: _fetch_executor.submit(_fetch_day, location, dates[i], api_key)
+        for i in missing
+        if i >= range_days
+    }
+
+    ranged = range_future.result() if range_future is not None else {}
+    for i in missing:
+        if i < range_days and dates[i] not in ranged:
+            day_futures[dates[i]] = _fetch_executor.submit(
+                _fetch_day, location, dates[i], api_key
+            )
+
+    fetched = {}
+    for i in missing:
+        date = dates[i]
+        if date in day_futures:
+            day = day_futures[date].result()
+        else:
+            day = ranged[date]
+        if isinstance(day, ForecastDay):
+            forecast_cache.set(location, date, day, lead_days=i)
+        fetched[date] = day
+    return fetched
+
+
+def _refresh(refresh_key, location, dates, missing, api_key):
+    try:
+        _fetch_missing(location, dates, missing, api_key)
+    except Exception as e:
+        logger.error(f"Background weather refresh for {location} failed: {str(e)}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(refresh_key)
+
+
+def _schedule_refresh(location, dates, missing, api_key):
+    refresh_key = (location_key(location), len(dates))
+    with _refreshing_lock:
+        if refresh_key in _refreshing:
+            return
+        _refreshing.add(refresh_key)
+    _refresh_executor.submit(_refresh, refresh_key, location, dates, missing, api_key)
+
+
+@timed("get_weather")
 def get_weather(location="Rawalpindi", days=1):
     """
     Get weather forecast for a specific location for the specified number of days.
-    Uses a looping technique to bypass the API's limitation for forecasts beyond 3 days.
+    Days already in the forecast cache are served from it and the rest are
+    fetched from the upstream.
+
+    When every missing day expired less than FORECAST_STALE_REVALIDATE seconds
+    ago, the expired days are returned at once and refreshed in the background.
+    Days the upstream fails to deliver fall back to the last good forecast.
+    Days served from expired entries are marked `stale`.
+
+    The location is canonicalized first, so every spelling of a place shares
+    cache entries and is sent upstream as the same query.
 
     Args:
         location (str): Location name (city, region, etc.)
         days (int): Number of forecast days (1-14)
 
     Returns:
-        dict: Weather forecast data by date
+        dict: ForecastDay or error entry by date. Render it with
+        forecast.render_forecast for the display format.
     """
     api_key = os.environ.get("WEATHER_API_KEY")
 
     if days < 1:
         return {"error": "Days must be at least 1"}
 
+    location = canonicalize(location).query
+
     today = datetime.now()
+    dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
 
-    forecast_result = {}
-
-    for i in range(days):
-        current_date = today + timedelta(days=i)
-        formatted_date = current_date.strftime("%Y-%m-%d")
-
-        url = f"https://api.weatherapi.com/v1/forecast.json?q={location}&days=1&dt={formatted_date}&key={api_key}"
-
-        response = requests.get(url)
-        if response.status_code != 200:
-            forecast_result[formatted_date] = {
-                "error": f"API request failed with status code {response.status_code}"
-            }
-            continue
-
-        data = response.json()
-
-        if (
-            "forecast" in data
-            and "forecastday" in data["forecast"]
-            and len(data["forecast"]["forecastday"]) > 0
-        ):
-            day_forecast = data["forecast"]["forecastday"][0]
-            day_data = day_forecast["day"]
-
-            max_temp_f = (day_data["maxtemp_c"] * 9 / 5) + 32
-            min_temp_f = (day_data["mintemp_c"] * 9 / 5) + 32
-
-            forecast_result[formatted_date] = {
-                "Condition": day_data["condition"]["text"],
-                "Max Temp": f"{day_data['maxtemp_c']}°C )",
-                "Min Temp": f"{day_data['mintemp_c']}°C ",
-                "Avg Temp": f"{day_data['avgtemp_c']}°C ",
-                "Humidity": f"{day_data['avghumidity']}%",
-                "Precipitation": f"{day_data['totalprecip_mm']} mm",
-                "Wind": f"{day_data['maxwind_kph']} kph",
-            }
-        else:
-            forecast_result[formatted_date] = {
-                "error": "No forecast data available for this date"
-            }
+    forecast_result = forecast_cache.get_many(location, dates)
+    missing = [i for i, date in enumerate(dates) if date not in forecast_result]
+    if not missing:
+        return {date: forecast_result[date] for date in dates}
+
+    stale = forecast_cache.get_stale_many(
+        location, [dates[i] for i in missing], FORECAST_STALE_REVALIDATE
+    )
+    if len(stale) == len(missing):
+        _schedule_refresh(location, dates, missing, api_key)
+        for date, day in stale.items():
+            forecast_result[date] = day.as_stale()
+        return {date: forecast_result[date] for date in dates}
+
+    for date, day in _fetch_missing(location, dates, missing, api_key).items():
+        if not isinstance(day, ForecastDay):
+            fallback = forecast_cache.get_stale(location, date)
+            if fallback is not None:
+                day = fallback.as_stale()
+        forecast_result[date] = day
+
+    return {date: forecast_result[date] for date in dates}
+
+
+def refresh_weather(location, days):
+    """
+    Fetch every day of the forecast from the upstream and cache it, whatever
+    is cached already. Used by the background prefetcher.
+
+    Returns:
+        dict: ForecastDay or error entry by date
+    """
+    today = datetime.now()
+    dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    return _fetch_missing(
+        canonicalize(location).query, dates, list(range(days)), os.environ.get("WEATHER_API_KEY")
+    )
 
-    return forecast_result
+
+async def get_weather_async(location="Rawalpindi", days=1):
+    """
+    Async variant of get_weather that runs on the bounded weather executor.
+    Concurrent requests for the same location and days share one call.
+    Requests are counted towards the prefetcher's hot locations.
+    """
+    prefetcher.popularity.record(location)
+    return await weather_flight.do_async(
+        (location_key(location), days), run_weather, get_weather, location, days
+    )
 
 
 def get_current_weather_summary(location):
@@ -86,10 +308,11 @@ def get_current_weather_summary(location):
     if "error" in weather_data or not weather_data:
         return "Weather data unavailable"
 
-    current_date = next(iter(weather_data))
-    current_weather = weather_data[current_date]
+    current_weather = next(iter(weather_data.values()))
+    if not isinstance(current_weather, ForecastDay):
+        return "Weather data unavailable"
 
-    return f"{current_weather['Condition']}, {current_weather['Avg Temp']}, {current_weather['Humidity']} humidity"
+    return f"{current_weather.condition}, {current_weather.avg_temp_c}°C, {current_weather.humidity:g}% humidity"
 
 
 # if __name__ == "__main__":
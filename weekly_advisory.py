@@ -1,7 +1,14 @@
-import os
 import json
-from groq import Groq
 from datetime import datetime
+from executors import run_llm
+from llm_client import (
+    DEFAULT_MODEL,
+    create_chat_completion,
+    extract_json,
+    stream_chat_completion,
+)
+from prompts import PromptTemplate, compact_json
+from task_lists import tasks_prompt_json
 
 EXAMPLE_ADVISORY = {
   "id": "A-2025-04-W17",
@@ -225,54 +232,33 @@ EXAMPLE_TASKS  =[
     }
   ]
 
-def generate_weekly_advisory(
-    parameters,
-    farm_report,
-    farm_tasks_for_upcoming_week=EXAMPLE_TASKS,
-    example_advisory=EXAMPLE_ADVISORY,
-    weather_data = None
-):
+ADVISORY_PROMPT_TEMPLATE = PromptTemplate(
     """
-    Generate weekly farm advisory based on farm report, parameters, and upcoming tasks
-    with structured output matching the desired format.
-
-    Args:
-        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
-        farm_report: String containing the latest farm condition report
-        farm_tasks_for_upcoming_week: List of dictionaries containing upcoming tasks (optional)
-        example_advisory: Example advisory to guide the LLM (optional)
-
-    Returns:
-        JSON formatted advisory matching the exact desired structure
-    """
-
-    # Create advisory generation prompt with all available information
-    advisory_prompt = f"""
-    I need to generate a comprehensive weekly farm advisory for a {parameters.get('crop', '')} farm in {parameters.get('farmLocation', '')}.
+    I need to generate a comprehensive weekly farm advisory for a {crop} farm in {farmLocation}.
     The advisory must follow EXACTLY the structure and format provided in the example. Do not deviate from this structure.
 
-    ## FARM REPORT (Generated on {datetime.now().strftime('%Y-%m-%d')}):
+    ## FARM REPORT (Generated on {today}):
     {farm_report}
 
     ## FARM PARAMETERS:
-    - Crop: {parameters.get('crop', '')}
-    - Location: {parameters.get('farmLocation', '')}
-    - Growth Stage: {parameters.get('currentGrowthStage', '')}
-    - Soil Type: {parameters.get('soilType', '')}
-    - Sowing Date: {parameters.get('sowingDate', '')}
-    - Water Source: {parameters.get('waterSource', '')}
-    - Irrigation Type: {parameters.get('irrigationType', '')}
-    - Water Availability: {parameters.get('waterAvailabilityStatus', '')}
-    - Fertilizer Type: {parameters.get('fertilizersUsed', '')}
+    - Crop: {crop}
+    - Location: {farmLocation}
+    - Growth Stage: {currentGrowthStage}
+    - Soil Type: {soilType}
+    - Sowing Date: {sowingDate}
+    - Water Source: {waterSource}
+    - Irrigation Type: {irrigationType}
+    - Water Availability: {waterAvailabilityStatus}
+    - Fertilizer Type: {fertilizersUsed}
 
 
     ## WEATHER FORECAST (Next 7 days):
     {weather_data}
 
     ## UPCOMING WEEK'S TASKS:
-    {json.dumps(farm_tasks_for_upcoming_week, indent=2) if farm_tasks_for_upcoming_week else "No tasks avaliable for upcoming week."}
+    {upcoming_tasks}
 
-    {f"Here is an example of tasks for reference: {json.dumps(example_advisory, indent=2)}" if example_advisory else ""}
+    {examples}
 
     Generate the weekly advisory.
     Return your response as a valid JSON object. The JSON structure should look exactly like this:
@@ -367,29 +353,227 @@ def generate_weekly_advisory(
     5. Focus on actionable recommendations specific to the current conditions
 
     Return ONLY the JSON output with no additional text or explanation.
+    """,
+    name="advisory",
+)
+
+
+def _example_section(example_advisory):
+    if not example_advisory:
+        return ""
+    return f"Here is an example of tasks for reference: {compact_json(example_advisory)}"
+
+
+def _tasks_section(farm_tasks_for_upcoming_week):
+    if not farm_tasks_for_upcoming_week:
+        return "No tasks avaliable for upcoming week."
+    return tasks_prompt_json(farm_tasks_for_upcoming_week)
+
+
+# The default example and task list are serialized once at import
+ADVISORY_PROMPT = ADVISORY_PROMPT_TEMPLATE.partial(
+    examples=_example_section(EXAMPLE_ADVISORY)
+)
+EXAMPLE_TASKS_SECTION = _tasks_section(EXAMPLE_TASKS)
+
+
+def prepare_advisory_prompt(
+    parameters,
+    farm_report,
+    example_advisory=EXAMPLE_ADVISORY,
+    weather_data=None,
+):
+    """
+    Bind everything in the advisory prompt except the upcoming tasks, so it
+    can be prepared while the tasks are still being generated.
+
+    Args:
+        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
+        farm_report: String containing the latest farm condition report
+        example_advisory: Example advisory to guide the LLM (optional)
+        weather_data: Weather forecast to include in the prompt (optional)
+
+    Returns:
+        PromptTemplate with only the `upcoming_tasks` slot left
     """
+    template = (
+        ADVISORY_PROMPT
+        if example_advisory is EXAMPLE_ADVISORY
+        else ADVISORY_PROMPT_TEMPLATE.partial(
+            examples=_example_section(example_advisory)
+        )
+    )
 
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    return template.partial(
+        crop=parameters.get("crop", ""),
+        farmLocation=parameters.get("farmLocation", ""),
+        today=datetime.now().strftime("%Y-%m-%d"),
+        farm_report=farm_report,
+        currentGrowthStage=parameters.get("currentGrowthStage", ""),
+        soilType=parameters.get("soilType", ""),
+        sowingDate=parameters.get("sowingDate", ""),
+        waterSource=parameters.get("waterSource", ""),
+        irrigationType=parameters.get("irrigationType", ""),
+        waterAvailabilityStatus=parameters.get("waterAvailabilityStatus", ""),
+        fertilizersUsed=parameters.get("fertilizersUsed", ""),
+        weather_data=weather_data,
+    )
 
-    response = client.chat.completions.create(
-        messages=[{"role": "user", "content": advisory_prompt}],
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        temperature=0.1,
-        response_format={"type": "json_object"},
+
+def render_advisory_prompt(prepared_prompt, farm_tasks_for_upcoming_week=EXAMPLE_TASKS):
+    """
+    Fill the upcoming tasks into a prompt from `prepare_advisory_prompt`.
+    """
+    return prepared_prompt.render(
+        upcoming_tasks=(
+            EXAMPLE_TASKS_SECTION
+            if farm_tasks_for_upcoming_week is EXAMPLE_TASKS
+            else _tasks_section(farm_tasks_for_upcoming_week)
+        ),
     )
 
-    # Parse and return the response
+
+def build_advisory_prompt(
+    parameters,
+    farm_report,
+    farm_tasks_for_upcoming_week=EXAMPLE_TASKS,
+    example_advisory=EXAMPLE_ADVISORY,
+    weather_data=None,
+):
+    """
+    Build the weekly advisory prompt.
+
+    Args:
+        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
+        farm_report: String containing the latest farm condition report
+        farm_tasks_for_upcoming_week: List of dictionaries containing upcoming tasks (optional)
+        example_advisory: Example advisory to guide the LLM (optional)
+        weather_data: Weather forecast to include in the prompt (optional)
+
+    Returns:
+        Rendered prompt text
+    """
+    prepared_prompt = prepare_advisory_prompt(
+        parameters, farm_report, example_advisory, weather_data
+    )
+    return render_advisory_prompt(prepared_prompt, farm_tasks_for_upcoming_week)
+
+
+def parse_advisory(content):
+    """
+    Parse the model output into the advisory dict, or an error dict carrying
+    the raw response when it is not valid JSON.
+    """
     try:
-        advisory_json = json.loads(response.choices[0].message.content)
+        advisory_json = extract_json(content)
         return advisory_json
     except json.JSONDecodeError as e:
         return {
             "error": "Failed to parse advisory response",
             "details": str(e),
-            "raw_response": response.choices[0].message.content,
+            "raw_response": content,
         }
 
 
+def generate_weekly_advisory(
+    parameters,
+    farm_report,
+    farm_tasks_for_upcoming_week=EXAMPLE_TASKS,
+    example_advisory=EXAMPLE_ADVISORY,
+    weather_data = None
+):
+    """
+    Generate weekly farm advisory based on farm report, parameters, and upcoming tasks
+    with structured output matching the desired format.
+
+    Args:
+        parameters: Dictionary containing farm parameters (crop, location, soil type, etc.)
+        farm_report: String containing the latest farm condition report
+        farm_tasks_for_upcoming_week: List of dictionaries containing upcoming tasks (optional)
+        example_advisory: Example advisory to guide the LLM (optional)
+
+    Returns:
+        JSON formatted advisory matching the exact desired structure
+    """
+    advisory_prompt = build_advisory_prompt(
+        parameters,
+        farm_report,
+        farm_tasks_for_upcoming_week,
+        example_advisory,
+        weather_data,
+    )
+
+    return complete_advisory(advisory_prompt)
+
+
+def complete_advisory(advisory_prompt):
+    """
+    Run the model on a rendered advisory prompt and parse the result.
+    """
+    content = create_chat_completion(
+        messages=[{"role": "user", "content": advisory_prompt}],
+        model=DEFAULT_MODEL,
+        temperature=0.1,
+        response_format={"type": "json_object"},
+        priority="advisory",
+    )
+
+    # Parse and return the response
+    return parse_advisory(content)
+
+
+def stream_weekly_advisory(
+    parameters,
+    farm_report,
+    farm_tasks_for_upcoming_week=EXAMPLE_TASKS,
+    example_advisory=EXAMPLE_ADVISORY,
+    weather_data=None,
+):
+    """
+    Stream the weekly advisory as content chunks while the model generates it.
+    """
+    advisory_prompt = build_advisory_prompt(
+        parameters,
+        farm_report,
+        farm_tasks_for_upcoming_week,
+        example_advisory,
+        weather_data,
+    )
+
+    return stream_chat_completion(
+        messages=[{"role": "user", "content": advisory_prompt}],
+        model=DEFAULT_MODEL,
+        temperature=0.1,
+        priority="advisory",
+    )
+
+
+async def generate_weekly_advisory_async(
+    parameters,
+    farm_report,
+    farm_tasks_for_upcoming_week=EXAMPLE_TASKS,
+    example_advisory=EXAMPLE_ADVISORY,
+    weather_data=None,
+):
+    """
+    Async variant of generate_weekly_advisory that runs on the bounded LLM executor.
+    """
+    return await run_llm(
+        generate_weekly_advisory,
+        parameters,
+        farm_report,
+        farm_tasks_for_upcoming_week,
+        example_advisory,
+        weather_data,
+    )
+
+
+async def complete_advisory_async(advisory_prompt):
+    """
+    Async variant of complete_advisory that runs on the bounded LLM executor.
+    """
+    return await run_llm(complete_advisory, advisory_prompt)
+
 
 if __name__ == "__main__":
     import json